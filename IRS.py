@@ -1,11 +1,23 @@
 import sys
 import re
 import mysql.connector
+import mysql.connector.pooling
 import configparser
 import logging
 import json
 import html  # 导入 html 模块
 import os
+import threading
+import time
+import argparse
+import cProfile
+import functools
+import tracemalloc
+from datetime import datetime
+import urllib.request
+import urllib.error
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QLineEdit, QPushButton, QTextEdit,
                              QScrollArea, QFrame, QMessageBox, QComboBox,
@@ -22,18 +34,705 @@ logging.basicConfig(
 )
 
 
+class Profiler:
+    """
+    性能分析开关。启用后，被 @profiled 装饰的操作在 cProfile 和 tracemalloc 下运行，
+    每次操作输出带时间戳的 .prof 文件 (可用 snakeviz、pstats 打开)、内存快照 .tracemalloc
+    (可用 tracemalloc.Snapshot.load 打开) 和内存增长最多的代码行摘要 .mem.txt。
+    """
+
+    enabled = False
+    output_dir = "profiles"
+    # 同一时刻只分析一个操作。cProfile 只记录启用它的线程：嵌套调用计入外层分析结果，
+    # 其他线程 (预热、守护进程、分区扫描) 中同时执行的操作不会出现在 .prof 中；内存快照则包含所有线程的分配
+    _lock = threading.Lock()
+
+    @classmethod
+    def enable(cls, output_dir="profiles"):
+        """
+        启用性能分析。
+
+        Args:
+            output_dir (str): 分析文件输出目录。
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        cls.output_dir = output_dir
+        cls.enabled = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)  # 记录 25 层调用栈，便于定位分配来源
+        logging.info(f"性能分析已启用，输出目录: {os.path.abspath(output_dir)}")
+
+    @classmethod
+    def run(cls, name, func, args, kwargs):
+        """
+        在分析器下执行 func 并输出分析文件。正在分析其他操作时直接执行，不单独分析。
+        CPU 分析只覆盖当前线程，func 交给其他线程的工作 (例如分区扫描) 不计入。
+        """
+        if not cls._lock.acquire(blocking=False):
+            return func(*args, **kwargs)
+        try:
+            base = os.path.join(cls.output_dir, f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{name}")
+            profile = cProfile.Profile()
+            before = tracemalloc.take_snapshot()
+            start = time.perf_counter()
+            profile.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+                elapsed = time.perf_counter() - start
+                cls._dump(name, base, profile, before, elapsed)
+        finally:
+            cls._lock.release()
+
+    @staticmethod
+    def _dump(name, base, profile, before, elapsed):
+        """
+        输出 CPU 分析文件和内存分配快照。
+        """
+        try:
+            profile.dump_stats(base + ".prof")
+            filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+            after = tracemalloc.take_snapshot().filter_traces(filters)
+            after.dump(base + ".tracemalloc")
+            with open(base + ".mem.txt", "w", encoding="utf-8") as file:
+                file.write(f"{name} 耗时 {elapsed:.3f}s\n")
+                for stat in after.compare_to(before.filter_traces(filters), "lineno")[:30]:
+                    file.write(f"{stat}\n")
+            logging.info(f"性能分析: {name} 耗时 {elapsed:.3f}s，分析文件: {base}.prof")
+        except Exception as e:
+            logging.error(f"写入性能分析文件失败: {e}")
+
+
+def profiled(name):
+    """
+    装饰器：性能分析启用时，在分析器下执行被装饰的操作。
+
+    Args:
+        name (str): 操作名称，用于分析文件命名。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not Profiler.enabled:
+                return func(*args, **kwargs)
+            return Profiler.run(name, func, args, kwargs)
+        return wrapper
+    return decorator
+
+
+class QueryBlockedError(Exception):
+    """
+    执行计划检查拦截了查询 (预计扫描行数超过阈值)。
+    """
+
+
+class PlanInspector:
+    """
+    执行计划检查：对每种查询形状 (SQL 语句) 运行一次 EXPLAIN 并缓存结论，
+    预计扫描行数超过阈值时告警或拦截，同时记录条件中缺少索引的列。
+    """
+
+    def __init__(self, max_scan_rows=100000, mode="warn"):
+        """
+        初始化执行计划检查。
+
+        Args:
+            max_scan_rows (int): 允许的最大预计扫描行数。
+            mode (str): 超过阈值时的处理方式：warn 告警后继续执行，block 拦截，off 不检查。
+        """
+        self.max_scan_rows = max_scan_rows
+        self.mode = mode
+        self._verdicts = {}  # key 为 SQL 语句，value 为检查结论
+        self._indexed_columns = {}  # key 为表名，value 为有索引的列集合
+        self._lock = threading.Lock()
+
+    def inspect(self, conn, table_name, query, params, condition):
+        """
+        检查查询形状的执行计划，结论按 SQL 语句缓存，同一形状只运行一次 EXPLAIN。
+
+        Args:
+            conn (mysql.connector.MySQLConnection): 用于运行 EXPLAIN 的数据库连接。
+            table_name (str): 表名。
+            query (str): SQL 语句 (含占位符)。
+            params (tuple): 查询参数，用于生成具有代表性的执行计划。
+            condition (str): WHERE 条件，用于找出条件列。
+
+        Returns:
+            str: 超过阈值时的告警信息，否则为 None。
+
+        Raises:
+            QueryBlockedError: block 模式下预计扫描行数超过阈值。
+        """
+        if self.mode == "off":
+            return None
+        with self._lock:
+            verdict = self._verdicts.get(query)
+        if verdict is None:
+            verdict = self._explain(conn, table_name, query, params, condition)
+            with self._lock:
+                self._verdicts[query] = verdict
+            logging.info(f"执行计划: {json.dumps(verdict, ensure_ascii=False)}")
+        if verdict["rows"] <= self.max_scan_rows:
+            return None
+
+        message = (f"{table_name} 表查询预计扫描 {verdict['rows']} 行 (阈值 {self.max_scan_rows})"
+                   + (f"，缺少索引的条件列: {', '.join(verdict['unindexed_columns'])}" if verdict['unindexed_columns'] else ""))
+        if self.mode == "block":
+            raise QueryBlockedError(f"查询已被拦截: {message}")
+        logging.warning(message)
+        return message
+
+    def _explain(self, conn, table_name, query, params, condition):
+        """
+        运行 EXPLAIN 并生成检查结论。
+        """
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(f"EXPLAIN {query}", params)
+            plan = cursor.fetchall()
+            indexed = self._get_indexed_columns(cursor, table_name)
+        finally:
+            cursor.close()
+        condition_columns = list(dict.fromkeys(re.findall(r'(\w+)\s*(?:=|LIKE)', condition, re.I)))
+        return {
+            "table": table_name,
+            "query": query,
+            "rows": sum(int(row.get("rows") or 0) for row in plan),
+            "full_scan": any(row.get("type") == "ALL" for row in plan),
+            "unindexed_columns": [column for column in condition_columns if column not in indexed]
+        }
+
+    def _get_indexed_columns(self, cursor, table_name):
+        """
+        获取表中有索引的列 (每个索引的第一列)，按表缓存。
+        """
+        with self._lock:
+            indexed = self._indexed_columns.get(table_name)
+        if indexed is None:
+            cursor.execute(f"SHOW INDEX FROM {table_name}")
+            indexed = {row["Column_name"] for row in cursor.fetchall() if int(row["Seq_in_index"]) == 1}
+            with self._lock:
+                self._indexed_columns[table_name] = indexed
+        return indexed
+
+    def stats(self):
+        """
+        获取检查统计信息，包括超过阈值的查询形状和缺少索引的列。
+        """
+        with self._lock:
+            verdicts = list(self._verdicts.values())
+        unindexed = {}
+        for verdict in verdicts:
+            for column in verdict["unindexed_columns"]:
+                unindexed.setdefault(verdict["table"], [])
+                if column not in unindexed[verdict["table"]]:
+                    unindexed[verdict["table"]].append(column)
+        return {
+            "mode": self.mode,
+            "max_scan_rows": self.max_scan_rows,
+            "shapes": len(verdicts),
+            "flagged": [{"query": v["query"], "rows": v["rows"]} for v in verdicts if v["rows"] > self.max_scan_rows],
+            "unindexed_columns": unindexed
+        }
+
+
+class PreparedStatementCache:
+    """
+    服务端预处理语句缓存，按 (表名, 查询列, 条件) 缓存预处理游标，重复查询时跳过 SQL 解析和执行计划生成。
+    """
+
+    def __init__(self, conn, max_size=32):
+        """
+        初始化预处理语句缓存。
+
+        Args:
+            conn (mysql.connector.MySQLConnection): 数据库连接对象，缓存只对该连接有效。
+            max_size (int): 最多缓存的预处理语句数量，超出时淘汰最久未使用的语句。
+        """
+        self.conn = conn
+        self.max_size = max(1, max_size)
+        self._statements = OrderedDict()  # key 为 (表名, 查询列, 条件)，value 为 (预处理游标, SQL 语句)
+        self.hits = 0  # 命中次数
+        self.misses = 0  # 未命中次数
+        self.evictions = 0  # 淘汰次数
+
+    def get(self, table_name, columns, condition):
+        """
+        获取查询形状对应的预处理游标，不存在时创建并按 LRU 策略淘汰旧语句。
+
+        Args:
+            table_name (str): 表名。
+            columns (list): 要查询的列名列表。
+            condition (str): 查询条件。
+
+        Returns:
+            tuple: (预处理游标, SQL 语句)。
+        """
+        key = (table_name, tuple(columns), condition)
+        entry = self._statements.get(key)
+        if entry is not None:
+            self._statements.move_to_end(key)  # 标记为最近使用
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        query = f"SELECT {', '.join(columns)} FROM {table_name} WHERE {condition}"  # 构建 SQL 查询语句
+        entry = (self.conn.cursor(prepared=True), query)
+        self._statements[key] = entry
+        if len(self._statements) > self.max_size:
+            # 淘汰最久未使用的语句，关闭游标以释放服务端资源
+            _, (old_cursor, _) = self._statements.popitem(last=False)
+            self._close_cursor(old_cursor)
+            self.evictions += 1
+        return entry
+
+    def discard(self, table_name, columns, condition):
+        """
+        丢弃指定查询形状的预处理语句 (例如执行出错后游标状态不可信时)。
+
+        Args:
+            table_name (str): 表名。
+            columns (list): 查询列名列表。
+            condition (str): 查询条件。
+        """
+        entry = self._statements.pop((table_name, tuple(columns), condition), None)
+        if entry is not None:
+            self._close_cursor(entry[0])
+
+    def clear(self):
+        """
+        清空缓存，数据库重连后原有的预处理语句已失效，必须调用。
+        """
+        for cursor, _ in self._statements.values():
+            self._close_cursor(cursor)
+        self._statements.clear()
+
+    def stats(self):
+        """
+        获取缓存统计信息。
+
+        Returns:
+            dict: 缓存大小、命中、未命中、淘汰次数及命中率。
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._statements),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+    @staticmethod
+    def _close_cursor(cursor):
+        """
+        关闭预处理游标，连接已断开时忽略错误。
+        """
+        try:
+            cursor.close()
+        except Exception as e:
+            logging.debug(f"关闭预处理语句失败: {e}")
+
+
+class ResultCache:
+    """
+    线程安全的查询结果缓存，超出容量时淘汰最久未使用的条目，条目超过有效期后自动失效。
+    每次 invalidate() 使失效代数加一，查询开始前记下代数，写入时代数已变化的结果会被丢弃，
+    避免在更新之前开始、之后才完成的查询 (例如预热) 把旧数据写回缓存。
+    """
+
+    def __init__(self, max_entries=256, ttl=300):
+        """
+        初始化结果缓存。
+
+        Args:
+            max_entries (int): 最多缓存的条目数。
+            ttl (float): 条目有效期 (秒)。
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key 为缓存键，value 为 (过期时间, 缓存值)
+        self._lock = threading.Lock()
+        self.generation = 0  # 失效代数
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """
+        读取缓存，不存在或已过期时返回 default。
+
+        Args:
+            key: 缓存键。
+            default: 未命中时的返回值。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]  # 已过期
+            self.misses += 1
+            return default
+
+    def put(self, key, value, generation=None):
+        """
+        写入缓存，超出容量时淘汰最久未使用的条目。
+
+        Args:
+            key: 缓存键。
+            value: 缓存值。
+            generation (int): 查询开始时的失效代数，之后缓存已失效过则不写入；为 None 时不检查。
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """
+        清空缓存，数据被更新后调用。
+        """
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        """
+        获取缓存统计信息。
+
+        Returns:
+            dict: 缓存大小、命中、未命中次数及命中率。
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+class SingleFlight:
+    """
+    合并并发的相同请求：同一 key 同一时刻只执行一次，其余调用方等待并共享同一结果。
+    GUI 的查询在界面线程中逐个同步执行，彼此不会并发；实际发生合并的是守护进程的各个会话之间，
+    以及 GUI 查询与后台缓存预热之间。
+    """
+
+    class _Call:
+        """
+        一次正在执行的调用。
+        """
+
+        def __init__(self):
+            self.event = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key 为请求键，value 为正在执行的调用
+        self.executed = 0  # 实际执行次数
+        self.coalesced = 0  # 被合并 (节省) 的次数
+
+    def do(self, key, func):
+        """
+        执行 func，如果相同 key 的调用正在进行，则等待其完成并返回同一结果。
+
+        Args:
+            key: 请求键，必须可哈希。
+            func (callable): 无参数的执行函数。
+
+        Returns:
+            func 的返回值。
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                self.executed += 1
+            call.event.set()
+
+    def stats(self):
+        """
+        获取合并统计信息。
+
+        Returns:
+            dict: 实际执行次数和被合并的次数。
+        """
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+class ColumnarResult:
+    """
+    列式查询结果：工作线程一次性把行数据转置为按列存储，界面线程通过引用直接读取，
+    渲染和守护进程传输都基于同一份列数据，无需复制或逐行重建。
+    """
+
+    __slots__ = ("table_name", "columns", "column_data", "row_count", "_escaped")
+
+    def __init__(self, table_name, columns, column_data, row_count):
+        """
+        初始化列式结果。
+
+        Args:
+            table_name (str): 表名。
+            columns (list): 列名列表。
+            column_data (list): 每列一个元组，与 columns 一一对应。
+            row_count (int): 行数。
+        """
+        self.table_name = table_name
+        self.columns = columns
+        self.column_data = column_data
+        self.row_count = row_count
+        self._escaped = {}  # 按列缓存 HTML 转义后的值，key 为列索引
+
+    @classmethod
+    def from_rows(cls, table_name, columns, rows):
+        """
+        从数据库返回的行数据构建列式结果，转置只在这里进行一次。
+
+        Args:
+            table_name (str): 表名。
+            columns (list): 列名列表。
+            rows (list): 行数据列表。
+        """
+        column_data = list(zip(*rows)) if rows else [() for _ in columns]
+        return cls(table_name, list(columns), column_data, len(rows))
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        从 to_dict() 生成的字典还原列式结果 (用于守护进程的 JSON 传输)。
+        """
+        return cls(data["table"], data["columns"], [tuple(values) for values in data["data"]], data["row_count"])
+
+    def to_dict(self):
+        """
+        转换为可 JSON 序列化的列式字典。
+        """
+        return {
+            "table": self.table_name,
+            "columns": self.columns,
+            "data": [list(values) for values in self.column_data],
+            "row_count": self.row_count
+        }
+
+    def column(self, index):
+        """
+        按列索引获取整列数据 (元组，直接引用，不复制)。
+        """
+        return self.column_data[index]
+
+    def column_by_name(self, name):
+        """
+        按列名获取整列数据。
+        """
+        return self.column_data[self.columns.index(name)]
+
+    def escaped_column(self, index):
+        """
+        获取 HTML 转义后的整列数据，结果按列缓存，重复渲染时不再转义。
+        """
+        values = self._escaped.get(index)
+        if values is None:
+            values = self._escaped[index] = [html.escape(str(value)) for value in self.column_data[index]]
+        return values
+
+    def row(self, index):
+        """
+        获取单行数据。
+        """
+        return tuple(values[index] for values in self.column_data)
+
+
+class PartitionedScanner:
+    """
+    大表子串查询 (LIKE '%text%') 的分区并行扫描：按整数主键范围把表切分为多个分区，
+    在连接池上并发扫描，每个分区完成即合并并回调。所有扫描共享同一个并发上限，避免压垮数据库。
+    表信息和主键范围在调用方已有的连接上读取，只有表的预估行数达到 min_rows 时才创建连接池。
+    """
+
+    INTEGER_TYPES = {"tinyint", "smallint", "mediumint", "int", "integer", "bigint"}
+
+    def __init__(self, db_config, partitions=8, max_concurrency=4, min_rows=200000):
+        """
+        初始化分区扫描。
+
+        Args:
+            db_config (dict): 数据库连接参数 (host, port, user, password, database)。
+            partitions (int): 每次扫描切分的分区数。
+            max_concurrency (int): 全局并发扫描的分区数上限，也是连接池大小。
+            min_rows (int): 表的预估行数达到该值时才使用分区扫描。
+        """
+        self.db_config = db_config
+        self.partitions = max(1, partitions)
+        self.max_concurrency = max(1, min(max_concurrency, 32))  # 连接池最多 32 个连接
+        self.min_rows = min_rows
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)  # 全局并发上限
+        self._pool = None  # 连接池，首次有表需要分区扫描时创建
+        self._table_info = {}  # key 为表名，value 为 (整数主键列, 预估行数)，无法分区时主键列为 None
+        self._lock = threading.Lock()
+        self.scans = 0  # 分区扫描次数
+
+    def scan(self, conn, table_name, columns, condition, params, on_partition=None):
+        """
+        分区并行执行查询。
+
+        Args:
+            conn: 调用方已有的数据库连接，用于读取表信息和主键范围。
+            table_name (str): 表名。
+            columns (list): 要查询的列名列表。
+            condition (str): 查询条件。
+            params (tuple): 查询参数。
+            on_partition (callable): 每个有数据的分区完成时以该分区的 ColumnarResult 调用。
+
+        Returns:
+            ColumnarResult: 全部分区合并后的列式查询结果 (按分区完成的先后)；
+            表太小或没有整数主键时返回 None，由调用方按普通方式查询。
+        """
+        primary_key, estimated_rows = self._get_table_info(conn, table_name)
+        if primary_key is None or estimated_rows < self.min_rows:
+            return None
+
+        low, high = self._fetch(conn, f"SELECT MIN({primary_key}), MAX({primary_key}) FROM {table_name}", ())[0]
+        if low is None:
+            return ColumnarResult.from_rows(table_name, columns, [])
+        step = (high - low) // self.partitions + 1
+        ranges = [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+        query = f"SELECT {', '.join(columns)} FROM {table_name} WHERE ({condition}) AND {primary_key} BETWEEN %s AND %s"
+        logging.debug(f"分区扫描 {table_name}: {len(ranges)} 个分区，主键 {primary_key} 范围 [{low}, {high}]")
+        rows = []
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [executor.submit(self._run, query, tuple(params) + bounds) for bounds in ranges]
+            for future in as_completed(futures):
+                part = future.result()  # 任一分区失败时抛出异常
+                rows.extend(part)  # 分区完成即合并，不等待其他分区
+                if part and on_partition is not None:
+                    on_partition(ColumnarResult.from_rows(table_name, columns, part))
+        with self._lock:
+            self.scans += 1
+        return ColumnarResult.from_rows(table_name, columns, rows)
+
+    def _run(self, query, params):
+        """
+        占用一个并发名额，从连接池取连接执行查询。
+        """
+        with self._slots:
+            conn = self._get_pool().get_connection()
+            try:
+                return self._fetch(conn, query, params)
+            finally:
+                conn.close()  # 归还连接池
+
+    @staticmethod
+    def _fetch(conn, query, params):
+        """
+        在指定连接上执行查询并读取全部行。
+        """
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _get_pool(self):
+        """
+        获取连接池，首次使用时创建。
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = mysql.connector.pooling.MySQLConnectionPool(
+                    pool_name=f"irs_scan_{id(self)}",
+                    pool_size=self.max_concurrency,
+                    connection_timeout=5,
+                    **self.db_config
+                )
+            return self._pool
+
+    def _get_table_info(self, conn, table_name):
+        """
+        在调用方的连接上获取表的整数主键列和预估行数，按表缓存。只有单列整数主键的表才能按范围切分。
+        """
+        with self._lock:
+            info = self._table_info.get(table_name)
+        if info is None:
+            rows = self._fetch(
+                conn,
+                "SELECT c.COLUMN_NAME, c.DATA_TYPE, t.TABLE_ROWS FROM information_schema.KEY_COLUMN_USAGE k "
+                "JOIN information_schema.COLUMNS c ON c.TABLE_SCHEMA = k.TABLE_SCHEMA "
+                "AND c.TABLE_NAME = k.TABLE_NAME AND c.COLUMN_NAME = k.COLUMN_NAME "
+                "JOIN information_schema.TABLES t ON t.TABLE_SCHEMA = k.TABLE_SCHEMA AND t.TABLE_NAME = k.TABLE_NAME "
+                "WHERE k.TABLE_SCHEMA = DATABASE() AND k.TABLE_NAME = %s AND k.CONSTRAINT_NAME = 'PRIMARY'",
+                (table_name,))
+            if len(rows) == 1 and str(rows[0][1]).lower() in self.INTEGER_TYPES:
+                info = (rows[0][0], int(rows[0][2] or 0))
+            else:
+                info = (None, 0)
+            with self._lock:
+                self._table_info[table_name] = info
+            logging.info(f"分区扫描: 表 {table_name} 主键 {info[0]}，预估 {info[1]} 行")
+        return info
+
+    def stats(self):
+        """
+        获取分区扫描统计信息。
+        """
+        with self._lock:
+            return {
+                "scans": self.scans,
+                "partitions": self.partitions,
+                "max_concurrency": self.max_concurrency,
+                "tables": {table: {"primary_key": pk, "estimated_rows": rows}
+                           for table, (pk, rows) in self._table_info.items()}
+            }
+
+
 class DatabaseWorker(QThread):
     """
     数据库操作工作线程，用于在后台线程执行数据库操作，避免阻塞 UI 线程。
     """
 
-    result_signal = pyqtSignal(str, list, list)  # 查询结果信号：表名，列名列表，数据列表
+    result_signal = pyqtSignal(object)  # 查询结果信号：列式查询结果 ColumnarResult
     error_signal = pyqtSignal(str)  # 错误信号：错误信息
     connection_signal = pyqtSignal(bool)  # 连接状态信号：连接成功/失败
     update_signal = pyqtSignal(str)  # 更新结果信号：更新信息
     columns_loaded_signal = pyqtSignal()  # 表字段加载完成信号
+    plan_warning_signal = pyqtSignal(str)  # 执行计划告警信号：告警信息
 
-    def __init__(self, host, port, user, password, database):
+    def __init__(self, host, port, user, password, database, statement_cache_size=32, result_cache=None,
+                 plan_inspector=None, single_flight=None, partitioned_scanner=None):
         """
         初始化数据库连接信息。
 
@@ -43,6 +742,11 @@ class DatabaseWorker(QThread):
             user (str): 数据库用户名。
             password (str): 数据库密码。
             database (str): 数据库名。
+            statement_cache_size (int): 预处理语句缓存容量。
+            result_cache (ResultCache): 查询结果缓存，可与其他工作线程共享，为 None 时不缓存。
+            plan_inspector (PlanInspector): 执行计划检查，可与其他工作线程共享，为 None 时不检查。
+            single_flight (SingleFlight): 相同查询的合并器，与其他工作线程共享时可跨连接合并。
+            partitioned_scanner (PartitionedScanner): 大表子串查询的分区并行扫描，为 None 时不使用。
         """
         super().__init__()
         self.host = host
@@ -52,6 +756,12 @@ class DatabaseWorker(QThread):
         self.database = database
         self.input_text = ""
         self.conn = None  # 数据库连接对象，初始为 None
+        self.statement_cache_size = statement_cache_size
+        self.statement_cache = None  # 预处理语句缓存，连接建立后创建
+        self.result_cache = result_cache
+        self.plan_inspector = plan_inspector
+        self.single_flight = single_flight if single_flight is not None else SingleFlight()
+        self.partitioned_scanner = partitioned_scanner
         self._table_columns = {}  # 存储表字段信息的字典，key 为表名，value 为字段列表
         # 预定义的条件列参数，用于限制更新操作的条件列范围，增强安全性
         self._table_conditions = {
@@ -67,15 +777,7 @@ class DatabaseWorker(QThread):
         在线程启动时自动执行，负责建立数据库连接并预加载表字段信息。
         """
         try:
-            # 尝试连接数据库
-            self.conn = mysql.connector.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                connection_timeout=5  # 设置连接超时时间为 5 秒
-            )
+            self.connect_database()  # 尝试连接数据库
             self.connection_signal.emit(True)  # 连接成功，发送连接成功信号
             self.preload_table_columns()  # 预加载表字段
 
@@ -90,15 +792,28 @@ class DatabaseWorker(QThread):
             self.error_signal.emit(f"连接失败: {e}")
             self.connection_signal.emit(False)
 
+    def connect_database(self):
+        """
+        建立数据库连接，并创建该连接的预处理语句缓存。
+        """
+        self.conn = mysql.connector.connect(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            connection_timeout=5  # 设置连接超时时间为 5 秒
+        )
+        self.statement_cache = PreparedStatementCache(self.conn, self.statement_cache_size)
+
+    @profiled("preload_table_columns")
     def preload_table_columns(self):
         """
         预加载所有表的字段名，存储在 self._table_columns 字典中，用于后续查询和更新操作。
         """
         for table_name in ["ecsstatic", "rdsstatic", "slbstatic", "ossstatic"]:
             try:
-                # 尝试重新连接数据库，防止连接断开
-                if not self.conn.is_connected():
-                    self.conn.reconnect(attempts=3, delay=1)
+                self._ensure_connection()  # 尝试重新连接数据库，防止连接断开
                 cursor = self.conn.cursor()
                 cursor.execute(f"SHOW COLUMNS FROM {table_name}")  # 执行 SQL 语句，获取表字段信息
                 columns = [row[0] for row in cursor.fetchall()]  # 提取字段名
@@ -110,6 +825,46 @@ class DatabaseWorker(QThread):
                 logging.error(f"获取表 {table_name} 字段失败: {e}")
         self.columns_loaded_signal.emit()  # 表字段加载完成，发送信号
 
+    def _ensure_connection(self):
+        """
+        检查数据库连接，断开时自动重连。重连后原连接上的预处理语句已失效，需清空缓存。
+        """
+        if not self.conn.is_connected():
+            self.conn.reconnect(attempts=3, delay=1)
+            if self.statement_cache is not None:
+                self.statement_cache.clear()
+
+    def get_metrics(self):
+        """
+        获取工作线程的运行指标。
+
+        Returns:
+            dict: 各项指标，key 为指标名。
+        """
+        metrics = {}
+        if self.statement_cache is not None:
+            metrics["statement_cache"] = self.statement_cache.stats()
+        if self.result_cache is not None:
+            metrics["result_cache"] = self.result_cache.stats()
+        if self.plan_inspector is not None:
+            metrics["query_plans"] = self.plan_inspector.stats()
+        metrics["coalescing"] = self.single_flight.stats()  # coalesced 为节省的数据库查询次数
+        if self.partitioned_scanner is not None:
+            metrics["partitioned_scan"] = self.partitioned_scanner.stats()
+        return metrics
+
+    def _check_plan(self, table_name, query, params, condition):
+        """
+        检查查询形状的执行计划；block 模式下抛出 QueryBlockedError。
+
+        Returns:
+            str: 超过阈值时的告警信息，由调用方发送告警信号，否则为 None。
+        """
+        if self.plan_inspector is None:
+            return None
+        return self.plan_inspector.inspect(self.conn, table_name, query, params, condition)
+
+    @profiled("execute_query")
     def execute_query(self, input_text):
         """
         执行查询操作，根据输入内容判断查询类型，并调用相应的查询函数。
@@ -118,9 +873,7 @@ class DatabaseWorker(QThread):
             input_text (str): 用户输入的查询内容。
         """
         try:
-            # 尝试重新连接数据库，防止连接断开
-            if not self.conn.is_connected():
-                self.conn.reconnect(attempts=3, delay=1)
+            self._ensure_connection()  # 尝试重新连接数据库，防止连接断开
 
             # 根据输入内容判断查询类型
             if self.is_valid_ip(input_text):
@@ -223,24 +976,20 @@ class DatabaseWorker(QThread):
             params (tuple): 查询参数。
         """
         try:
-            cursor = self.conn.cursor()
-            query = f"SELECT {', '.join(columns)} FROM {table_name} WHERE {condition}"  # 构建 SQL 查询语句
-
-            # 记录查询信息到日志
-            log_data = {"table_name": table_name, "query": query, "params": params}
-            logging.debug(f"执行查询: {json.dumps(log_data, ensure_ascii=False)}")
-
-            cursor.execute(query, params)  # 执行 SQL 语句
-            results = cursor.fetchall()  # 获取查询结果
-
-            if results:
-                # 查询到数据，发送查询结果信号
-                self.result_signal.emit(table_name, columns, results)
-            else:
-                # 未查询到数据，发送空结果信号
-                self.result_signal.emit(table_name, [], [])
-
-            cursor.close()
+            # 分区扫描时每个分区完成即发送，其余情况转置为列式结果后按引用发送，未查询到数据时行数为 0
+            partitions = []
+
+            def on_partition(result):
+                partitions.append(result)
+                self.result_signal.emit(result)
+
+            result = self.fetch_table(table_name, columns, condition, params, on_partition)
+            if not partitions:
+                self.result_signal.emit(result)
+        except QueryBlockedError as e:
+            # 预计扫描行数超过阈值，查询未执行
+            self.error_signal.emit(str(e))
+            logging.warning(str(e))
         except mysql.connector.Error as e:
             # 查询失败，记录错误信息并发送错误信号
             self.error_signal.emit(f"{table_name}表查询失败: {e}")
@@ -250,6 +999,72 @@ class DatabaseWorker(QThread):
             self.error_signal.emit(f"查询 {table_name} 表时发生未知错误: {e}")
             logging.exception(f"查询 {table_name} 表时发生未知错误: {e}")
 
+    def fetch_table(self, table_name, columns, condition, params, on_partition=None):
+        """
+        查询单个表并返回列式结果，优先使用结果缓存。
+
+        Args:
+            table_name (str): 表名。
+            columns (list): 要查询的列名列表。
+            condition (str): 查询条件。
+            params (tuple): 查询参数。
+            on_partition (callable): 本线程执行分区扫描时，每个有数据的分区完成即以其结果调用；
+                命中缓存或与其他线程合并时不调用。
+
+        Returns:
+            ColumnarResult: 列式查询结果。
+        """
+        cache_key = (table_name, condition, tuple(params))
+        generation = None
+        if self.result_cache is not None:
+            generation = self.result_cache.generation  # 先记下失效代数，再查缓存和数据库
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                logging.debug(f"结果缓存命中: {table_name} {params}")
+                return cached
+
+        # 并发的相同查询只访问一次数据库，其余调用方共享同一结果和执行计划告警，各自发送告警信号
+        result, warning = self.single_flight.do(
+            cache_key, lambda: self._fetch_uncached(table_name, columns, condition, params, generation, on_partition))
+        if warning:
+            self.plan_warning_signal.emit(warning)
+        return result
+
+    def _fetch_uncached(self, table_name, columns, condition, params, generation=None, on_partition=None):
+        """
+        在本线程的连接上执行查询，并把结果写入结果缓存 (查询期间缓存已失效过则不写入)。
+
+        Returns:
+            tuple: (列式查询结果, 执行计划告警信息或 None)。
+        """
+        try:
+            # 同一查询形状复用服务端预处理语句，只在首次使用时解析
+            cursor, query = self.statement_cache.get(table_name, columns, condition)
+            warning = self._check_plan(table_name, query, params, condition)  # 检查执行计划，必要时拦截
+
+            # 记录查询信息到日志
+            log_data = {"table_name": table_name, "query": query, "params": params}
+            logging.debug(f"执行查询: {json.dumps(log_data, ensure_ascii=False)}")
+
+            # 大表上的子串查询 (LIKE '%text%') 无法使用索引，按主键范围分区并行扫描
+            result = None
+            if self.partitioned_scanner is not None and "LIKE" in condition.upper() and str(params[0]).startswith("%"):
+                result = self.partitioned_scanner.scan(self.conn, table_name, columns, condition, params, on_partition)
+
+            if result is None:
+                cursor.execute(query, params)  # 执行预处理语句
+                result = ColumnarResult.from_rows(table_name, columns, cursor.fetchall())
+                logging.debug(f"预处理语句缓存: {json.dumps(self.statement_cache.stats())}")
+        except mysql.connector.Error:
+            # 查询失败，丢弃可能处于异常状态的预处理语句
+            self.statement_cache.discard(table_name, columns, condition)
+            raise
+
+        if self.result_cache is not None:
+            self.result_cache.put((table_name, condition, tuple(params)), result, generation)
+        return result, warning
+
+    @profiled("execute_update")
     def execute_update(self, table_name, update_column, update_value, conditions):
         """
         执行更新操作 (修改)。
@@ -261,9 +1076,7 @@ class DatabaseWorker(QThread):
             conditions (dict): 更新条件，key 为列名，value 为列值。
         """
         try:
-            # 尝试重新连接数据库，防止连接断开
-            if not self.conn.is_connected():
-                self.conn.reconnect(attempts=3, delay=1)
+            self._ensure_connection()  # 尝试重新连接数据库，防止连接断开
 
             cursor = self.conn.cursor()
 
@@ -284,12 +1097,21 @@ class DatabaseWorker(QThread):
             }
             logging.debug(f"执行更新: {json.dumps(log_data, ensure_ascii=False)}")
 
+            warning = self._check_plan(table_name, query, tuple(params), where_clause)  # 检查执行计划，必要时拦截
+            if warning:
+                self.plan_warning_signal.emit(warning)
             cursor.execute(query, tuple(params))  # 执行 SQL 语句
             self.conn.commit()  # 提交事务
+            if self.result_cache is not None:
+                self.result_cache.invalidate()  # 数据已变更，缓存的查询结果失效
             self.update_signal.emit(
                 f"成功更新 {table_name} 表: {update_column} = {update_value} WHERE {where_clause} (条件: {conditions})")  # 发送更新结果信号
             cursor.close()
 
+        except QueryBlockedError as e:
+            # 预计扫描行数超过阈值，更新未执行
+            self.error_signal.emit(str(e))
+            logging.warning(str(e))
         except mysql.connector.Error as e:
             # 更新失败，记录错误信息并发送错误信号
             self.error_signal.emit(f"更新 {table_name} 表失败: {e}")
@@ -348,6 +1170,237 @@ class DatabaseWorker(QThread):
         return error_messages.get(err.errno, f"数据库错误: {err}")
 
 
+class QueryHistory:
+    """
+    查询历史：持久化去重后的查询内容及其查询次数，用于启动时预热结果缓存。
+    次数每次保存时减半，次数相同时最近查询过的优先，新的常用查询不会被早年的条目挤掉。
+    """
+
+    def __init__(self, filename="query_history.json", max_entries=500):
+        """
+        初始化并加载查询历史。
+
+        Args:
+            filename (str): 历史文件路径。
+            max_entries (int): 最多保留的条目数，保存时只保留查询次数最多的条目。
+        """
+        self.filename = filename
+        self.max_entries = max(1, max_entries)
+        self.counts = {}  # key 为查询内容，value 为衰减后的查询次数；按最近一次查询的先后排列
+        try:
+            with open(filename, 'r', encoding='utf-8') as file:
+                self.counts = {str(text): float(count) for text, count in json.load(file).items()}
+        except FileNotFoundError:
+            pass
+        except (ValueError, AttributeError) as e:
+            logging.error(f"查询历史文件损坏，已忽略: {e}")
+
+    def record(self, text):
+        """
+        记录一次查询，并把该条目移到最近使用的位置。
+        """
+        self.counts[text] = self.counts.pop(text, 0) + 1
+
+    def top(self, n):
+        """
+        获取查询次数最多的 n 条查询内容，次数相同时最近查询过的在前。
+        """
+        # 排序是稳定的，先按最近使用倒序排列即可让同次数的新条目排在前面
+        return sorted(reversed(list(self.counts)), key=self.counts.get, reverse=True)[:n]
+
+    def save(self):
+        """
+        压缩并保存查询历史，先写临时文件再替换，避免写入中断导致文件损坏。
+        保留的条目次数减半，长期不再查询的条目逐渐让位给新的常用查询。
+        """
+        kept = set(self.top(self.max_entries))
+        self.counts = {text: count / 2 for text, count in self.counts.items() if text in kept}
+        temp_name = self.filename + ".tmp"
+        try:
+            with open(temp_name, 'w', encoding='utf-8') as file:
+                json.dump(self.counts, file, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_name, self.filename)
+        except OSError as e:
+            logging.error(f"保存查询历史失败: {e}")
+
+
+class CacheWarmupWorker(DatabaseWorker):
+    """
+    缓存预热线程：使用独立的数据库连接，以低优先级在后台查询常用内容，
+    只把结果写入共享结果缓存，不向界面发送任何信号。
+    """
+
+    def __init__(self, host, port, user, password, database, table_columns, inputs, result_cache,
+                 plan_inspector=None, single_flight=None, partitioned_scanner=None):
+        """
+        初始化预热线程。
+
+        Args:
+            table_columns (dict): 已加载的表字段信息，避免重复预加载。
+            inputs (list): 需要预热的查询内容。
+            result_cache (ResultCache): 与主工作线程共享的结果缓存。
+            plan_inspector (PlanInspector): 与主工作线程共享的执行计划检查。
+            single_flight (SingleFlight): 与主工作线程共享的查询合并器，预热与用户查询同一内容时只查询一次。
+            partitioned_scanner (PartitionedScanner): 与主工作线程共享的分区扫描 (共享并发上限)。
+        """
+        super().__init__(host, port, user, password, database, result_cache=result_cache,
+                         plan_inspector=plan_inspector, single_flight=single_flight,
+                         partitioned_scanner=partitioned_scanner)
+        self._table_columns = dict(table_columns)
+        self.inputs = inputs
+
+    def run(self):
+        """
+        逐条预热查询内容，界面关闭时可随时中断。
+        """
+        try:
+            self.connect_database()
+            for text in self.inputs:
+                if self.isInterruptionRequested():
+                    break
+                self.execute_query(text)
+            logging.info(f"结果缓存预热完成: {len(self.inputs)} 条，{json.dumps(self.result_cache.stats())}")
+        except Exception as e:
+            logging.error(f"结果缓存预热失败: {e}")
+        finally:
+            if self.conn is not None and self.conn.is_connected():
+                self.conn.close()
+
+    def query_table(self, table_name, columns, condition, params):
+        """
+        只填充结果缓存，不发送查询结果信号。
+        """
+        try:
+            self.fetch_table(table_name, columns, condition, params)
+        except Exception as e:
+            logging.debug(f"预热 {table_name} 表失败: {e}")
+
+
+class RemoteDatabaseWorker(QThread):
+    """
+    查询守护进程 (irs_daemon.py) 的瘦客户端，提供与 DatabaseWorker 相同的信号和方法，
+    查询和更新通过本地 HTTP/JSON 接口交给守护进程执行。
+    """
+
+    result_signal = pyqtSignal(object)  # 查询结果信号：列式查询结果 ColumnarResult
+    error_signal = pyqtSignal(str)  # 错误信号：错误信息
+    connection_signal = pyqtSignal(bool)  # 连接状态信号：连接成功/失败
+    update_signal = pyqtSignal(str)  # 更新结果信号：更新信息
+    columns_loaded_signal = pyqtSignal()  # 表字段加载完成信号
+    plan_warning_signal = pyqtSignal(str)  # 执行计划告警信号：告警信息
+
+    def __init__(self, url, token='', timeout=30):
+        """
+        初始化守护进程地址。
+
+        Args:
+            url (str): 守护进程地址，例如 http://127.0.0.1:8765。
+            token (str): 更新接口的共享令牌，与守护进程的 [DAEMON] token 一致。
+            timeout (float): 请求超时时间 (秒)。
+        """
+        super().__init__()
+        self.url = url.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+        self.conn = None  # 数据库连接由守护进程持有
+        self._table_columns = {}
+        self._table_conditions = {}
+
+    def run(self):
+        """
+        连接守护进程并获取表字段信息。
+        """
+        try:
+            schema = self._request("GET", "/schema")
+            self._table_columns = schema["columns"]
+            self._table_conditions = schema["conditions"]
+            self.connection_signal.emit(True)
+            self.columns_loaded_signal.emit()
+        except Exception as e:
+            logging.error(f"连接查询守护进程失败: {e}")
+            self.error_signal.emit(f"连接查询守护进程失败: {e}")
+            self.connection_signal.emit(False)
+
+    def execute_query(self, input_text):
+        """
+        通过守护进程执行查询。
+
+        Args:
+            input_text (str): 用户输入的查询内容。
+        """
+        try:
+            response = self._request("POST", "/query", {"text": input_text})
+            for result in response["results"]:
+                self.result_signal.emit(ColumnarResult.from_dict(result))
+            for warning in response.get("warnings", []):
+                self.plan_warning_signal.emit(warning)
+            for error in response["errors"]:
+                self.error_signal.emit(error)
+        except Exception as e:
+            self.error_signal.emit(f"查询失败: {e}")
+            logging.error(f"通过守护进程查询失败: {e}")
+
+    def execute_update(self, table_name, update_column, update_value, conditions):
+        """
+        通过守护进程执行更新。
+
+        Args:
+            table_name (str): 要更新的表名。
+            update_column (str): 要更新的列名。
+            update_value (str): 新的列值。
+            conditions (dict): 更新条件，key 为列名，value 为列值。
+        """
+        try:
+            response = self._request("POST", "/update", {
+                "table": table_name,
+                "column": update_column,
+                "value": update_value,
+                "conditions": conditions
+            })
+            for error in response["errors"]:
+                self.error_signal.emit(error)
+            if response.get("message"):
+                self.update_signal.emit(response["message"])
+        except Exception as e:
+            self.error_signal.emit(f"更新 {table_name} 表失败: {e}")
+            logging.error(f"通过守护进程更新失败: {e}")
+
+    def get_metrics(self):
+        """
+        获取守护进程的运行指标。
+        """
+        try:
+            return self._request("GET", "/metrics")
+        except Exception as e:
+            logging.error(f"获取守护进程指标失败: {e}")
+            return {}
+
+    def _request(self, method, path, payload=None):
+        """
+        发送 HTTP 请求并解析 JSON 响应。
+
+        Args:
+            method (str): 请求方法。
+            path (str): 接口路径。
+            payload (dict): 请求体，GET 请求为 None。
+
+        Returns:
+            dict: 响应内容。
+        """
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else None
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["X-IRS-Token"] = self.token
+        request = urllib.request.Request(self.url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            # 守护进程以 JSON 返回错误信息
+            body = json.loads(e.read().decode('utf-8') or "{}")
+            raise RuntimeError(body.get("error", str(e))) from None
+
+
 class MainWindow(QWidget):
     """
     主界面类，负责 UI 显示和用户交互。
@@ -359,6 +1412,8 @@ class MainWindow(QWidget):
         """
         super().__init__()
         self.worker = None  # 数据库工作线程对象，初始为 None
+        self.warmup_worker = None  # 缓存预热线程对象，初始为 None
+        self.last_result_table = None  # 结果区最后显示的表名，分区扫描的后续分区不再重复显示表名
         self.db_connected = False  # 数据库连接状态，初始为 False
         self.init_ui()  # 初始化 UI 界面
         self.load_config()  # 加载配置文件
@@ -512,6 +1567,39 @@ class MainWindow(QWidget):
                 'password': self.config.get('DATABASE', 'password'),
                 'database': self.config.get('DATABASE', 'database')
             }
+            # 性能相关配置，缺省时使用默认值
+            self.statement_cache_size = self.config.getint('PERFORMANCE', 'statement_cache_size', fallback=32)
+            # 配置了查询守护进程地址时，作为瘦客户端连接守护进程
+            self.daemon_url = self.config.get('DAEMON', 'url', fallback='').strip()
+            self.daemon_token = self.config.get('DAEMON', 'token', fallback='').strip()
+            # 结果缓存及基于查询历史的启动预热。缓存默认关闭：其他人修改数据库后，缓存的结果在有效期内不会更新
+            result_cache_ttl = self.config.getfloat('CACHE', 'result_cache_ttl', fallback=0)
+            self.result_cache = ResultCache(
+                self.config.getint('CACHE', 'result_cache_size', fallback=256),
+                result_cache_ttl
+            ) if result_cache_ttl > 0 else None
+            self.query_history = QueryHistory(
+                self.config.get('CACHE', 'history_file', fallback='query_history.json'),
+                self.config.getint('CACHE', 'history_size', fallback=500)
+            )
+            self.warmup_count = self.config.getint('CACHE', 'warmup_count', fallback=20)
+            # 执行计划检查：预计扫描行数超过阈值时告警 (warn) 或拦截 (block)
+            self.plan_inspector = PlanInspector(
+                self.config.getint('PLAN', 'max_scan_rows', fallback=100000),
+                self.config.get('PLAN', 'mode', fallback='warn').strip().lower()
+            )
+            # 大表子串查询的分区并行扫描
+            self.partitioned_scanner = None
+            if self.config.getboolean('SCAN', 'enabled', fallback=False):
+                self.partitioned_scanner = PartitionedScanner(
+                    self.db_config,
+                    partitions=self.config.getint('SCAN', 'partitions', fallback=8),
+                    max_concurrency=self.config.getint('SCAN', 'max_concurrency', fallback=4),
+                    min_rows=self.config.getint('SCAN', 'min_rows', fallback=200000)
+                )
+            # 性能分析开关，也可以通过命令行参数 --profile 启用
+            if self.config.getboolean('PROFILING', 'enabled', fallback=False):
+                Profiler.enable(self.config.get('PROFILING', 'output_dir', fallback='profiles'))
         except Exception as e:
             QMessageBox.critical(self, "配置错误", f"配置文件错误: {e}")
             sys.exit(1)
@@ -520,18 +1608,26 @@ class MainWindow(QWidget):
         """
         初始化数据库连接。
         """
-        self.worker = DatabaseWorker(
-            host=self.db_config['host'],
-            port=self.db_config['port'],
-            user=self.db_config['user'],
-            password=self.db_config['password'],
-            database=self.db_config['database']
-        )  # 创建数据库工作线程
+        if self.daemon_url:
+            self.worker = RemoteDatabaseWorker(self.daemon_url, self.daemon_token)  # 通过查询守护进程访问数据库
+        else:
+            self.worker = DatabaseWorker(
+                host=self.db_config['host'],
+                port=self.db_config['port'],
+                user=self.db_config['user'],
+                password=self.db_config['password'],
+                database=self.db_config['database'],
+                statement_cache_size=self.statement_cache_size,
+                result_cache=self.result_cache,
+                plan_inspector=self.plan_inspector,
+                partitioned_scanner=self.partitioned_scanner
+            )  # 创建数据库工作线程
         self.worker.error_signal.connect(self.show_error)  # 绑定错误信号
         self.worker.connection_signal.connect(self.handle_connection)  # 绑定连接状态信号
         self.worker.result_signal.connect(self.handle_results)  # 绑定查询结果信号
         self.worker.update_signal.connect(self.handle_update_result)  # 绑定更新结果信号
         self.worker.columns_loaded_signal.connect(self.handle_columns_loaded)  # 绑定表字段加载完成信号
+        self.worker.plan_warning_signal.connect(self.show_plan_warning)  # 绑定执行计划告警信号
         self.worker.start()  # 启动数据库工作线程
 
     def execute_query(self):
@@ -552,6 +1648,8 @@ class MainWindow(QWidget):
         self.status_bar.setText("正在查询...")  # 设置状态栏信息
         self.query_btn.setEnabled(False)  # 禁用查询按钮
         self.result_area.clear()  # 清空结果显示区域
+        self.last_result_table = None
+        self.query_history.record(input_text)  # 记录查询历史，用于下次启动时预热
         self.worker.execute_query(input_text)  # 执行查询
 
     def execute_update(self):
@@ -595,31 +1693,30 @@ class MainWindow(QWidget):
         self.update_btn.setEnabled(False)  # 禁用更新按钮
         self.worker.execute_update(table_name, update_column, update_value, conditions)  # 执行更新
 
-    def handle_results(self, table_name, columns, data):
+    @profiled("handle_results")
+    def handle_results(self, result):
         """
         处理查询结果。
 
         Args:
-            table_name (str): 表名。
-            columns (list): 列名列表。
-            data (list): 数据列表。
+            result (ColumnarResult): 列式查询结果。
         """
-        self.result_area.append(f"【{table_name}】")  # 添加表名到结果显示区域
-        if columns and data:
+        if result.table_name != self.last_result_table:
+            self.result_area.append(f"【{result.table_name}】")  # 添加表名到结果显示区域
+            self.last_result_table = result.table_name
+        if result.row_count:
             # 构建 HTML 表格
-            html_table = "<table border='1' style='border-collapse: collapse; font-size: 14px;'>"
-
-            # 添加数据行 (每列一列)
-            for i, column in enumerate(columns):
-                html_table += "<tr>"
-                html_table += f"<th style='padding: 5px; min-width: 120px;'>{column}</th>"
-                # 遍历每一行数据，取出当前列的值
-                values = [html.escape(str(row[i])) for row in data]
-                html_table += f"<td style='padding: 5px;'>{'<br>'.join(values)}</td>"
-                html_table += "</tr>"
-
-            html_table += "</table>"
-            self.result_area.insertHtml(html_table)  # 插入 HTML 表格到结果显示区域
+            parts = ["<table border='1' style='border-collapse: collapse; font-size: 14px;'>"]
+
+            # 添加数据行 (每列一列)，直接读取整列数据
+            for i, column in enumerate(result.columns):
+                parts.append("<tr>")
+                parts.append(f"<th style='padding: 5px; min-width: 120px;'>{column}</th>")
+                parts.append(f"<td style='padding: 5px;'>{'<br>'.join(result.escaped_column(i))}</td>")
+                parts.append("</tr>")
+
+            parts.append("</table>")
+            self.result_area.insertHtml("".join(parts))  # 插入 HTML 表格到结果显示区域
         else:
             self.result_area.append("未查询到数据")  # 未查询到数据
 
@@ -649,6 +1746,15 @@ class MainWindow(QWidget):
         self.query_btn.setEnabled(True)  # 启用查询按钮
         self.update_btn.setEnabled(True)  # 启用更新按钮
 
+    def show_plan_warning(self, message):
+        """
+        显示执行计划告警。
+
+        Args:
+            message (str): 告警信息。
+        """
+        self.result_area.append(f"<span style='color: #E65100;'>⚠ {html.escape(message)}</span>")
+
     def handle_connection(self, success):
         """
         处理连接状态。
@@ -673,21 +1779,59 @@ class MainWindow(QWidget):
         self.update_update_columns(0)  # 更新更新列下拉框
         self.update_condition_columns(0)  # 更新条件列下拉框
         self.table_combo.currentIndexChanged.connect(self.update_condition_columns)  # 绑定表选择事件
+        self.start_cache_warmup()  # 后台预热常用查询
+
+    def start_cache_warmup(self):
+        """
+        以最低优先级在后台预热查询历史中最常用的查询内容，不阻塞界面。
+        """
+        if not isinstance(self.worker, DatabaseWorker) or self.result_cache is None or self.warmup_count <= 0:
+            return  # 瘦客户端模式由守护进程负责缓存，未启用结果缓存时无需预热
+        inputs = self.query_history.top(self.warmup_count)
+        if not inputs:
+            return
+        self.warmup_worker = CacheWarmupWorker(
+            host=self.db_config['host'],
+            port=self.db_config['port'],
+            user=self.db_config['user'],
+            password=self.db_config['password'],
+            database=self.db_config['database'],
+            table_columns=self.worker._table_columns,
+            inputs=inputs,
+            result_cache=self.result_cache,
+            plan_inspector=self.plan_inspector,
+            single_flight=self.worker.single_flight,
+            partitioned_scanner=self.partitioned_scanner
+        )
+        self.warmup_worker.start(QThread.LowestPriority)
 
     def closeEvent(self, event):
         """
         关闭事件。
         """
+        if self.worker:
+            logging.info(f"运行指标: {json.dumps(self.worker.get_metrics(), ensure_ascii=False)}")  # 记录缓存命中率等指标
+        if self.warmup_worker and self.warmup_worker.isRunning():
+            self.warmup_worker.requestInterruption()  # 停止缓存预热
+            self.warmup_worker.wait(2000)
+        self.query_history.save()  # 保存查询历史
         if self.worker and self.worker.isRunning():
             self.worker.terminate()  # 停止数据库工作线程
-        if hasattr(self.worker, 'conn') and self.worker.conn.is_connected():
+        if getattr(self.worker, 'conn', None) is not None and self.worker.conn.is_connected():
             self.worker.conn.close()  # 关闭数据库连接
         logging.shutdown()  # 关闭 logging
         event.accept()
 
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="IRS数据库工具")
+    parser.add_argument("--profile", nargs="?", const="profiles", metavar="DIR",
+                        help="启用性能分析，分析文件输出到 DIR (默认 profiles)")
+    args, qt_args = parser.parse_known_args()
+    if args.profile:
+        Profiler.enable(args.profile)
+
+    app = QApplication(sys.argv[:1] + qt_args)
     window = MainWindow()
     window.show()
     sys.exit(app.exec_())
@@ -0,0 +1,200 @@
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import tracemalloc
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import Qt, QCoreApplication
+
+import 端口组 as chat
+from mock_provider import start_server, add_settings_arguments, settings_from_args
+
+# 参与测试的代码路径：(提供商, 是否流式)
+BENCHMARK_PATHS = [
+    ("openai", True),
+    ("openai", False),
+    ("deepseek-r1", True),
+    ("deepseek-r1", False),
+    ("gemini-2.0", False),
+]
+
+
+def percentile(values, ratio):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def ms(value):
+    return None if value is None else round(value * 1000, 1)
+
+
+class PathBenchmark:
+    """
+    测量一个代码路径：冷连接与热连接的耗时差 (握手开销)、首字节时间、首个分片时间、吞吐量和内存峰值。
+    """
+
+    def __init__(self, provider, stream, prompt, image_path=None):
+        self.provider = provider
+        self.stream = stream
+        self.prompt = prompt
+        self.image_path = image_path
+        self._local = threading.local()
+
+    def _on_response(self, response, *args, **kwargs):
+        # 响应头解析完成时触发，elapsed 即首字节时间
+        self._local.ttfb = response.elapsed.total_seconds()
+
+    def _session(self):
+        session = chat.session_pool.get(self.provider)
+        if self._on_response not in session.hooks["response"]:
+            session.hooks["response"].append(self._on_response)
+        return session
+
+    def request(self):
+        """
+        发送一次请求。
+
+        Returns:
+            dict: 总耗时、首字节时间、首个分片时间、回复长度和错误信息。
+        """
+        self._session()
+        self._local.ttfb = None
+        thread = chat.ApiCallThread(self.prompt, self.image_path)
+        first_chunk = []
+        start = time.perf_counter()
+        thread.chunk_received.connect(lambda _: first_chunk or first_chunk.append(time.perf_counter() - start),
+                                      type=Qt.DirectConnection)
+        try:
+            response = thread.call_provider(self.provider, self.prompt, self.image_path, self.stream)
+            error = None
+        except Exception as e:
+            response, error = "", str(e)
+        return {
+            "total": time.perf_counter() - start,
+            "ttfb": self._local.ttfb,
+            "first_chunk": first_chunk[0] if first_chunk else None,
+            "chars": len(response),
+            "error": error
+        }
+
+    def run(self, requests, concurrency, host, port):
+        """
+        执行测试。
+
+        Args:
+            requests (int): 热连接阶段的请求数。
+            concurrency (int): 热连接阶段的并发数。
+            host (str): 服务地址，用于单独测量 TCP 连接时间。
+            port (int): 服务端口。
+
+        Returns:
+            dict: 测试结果。
+        """
+        connect_times = []
+        for _ in range(5):
+            start = time.perf_counter()
+            socket.create_connection((host, port), timeout=5).close()
+            connect_times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        chat.session_pool.close()  # 冷启动：第一次请求需要重新建立连接
+        cold = self.request()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            samples = list(executor.map(lambda _: self.request(), range(requests)))
+        wall = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        succeeded = [sample for sample in samples if sample["error"] is None]
+        warm_total = percentile([sample["total"] for sample in succeeded], 0.5)
+        return {
+            "path": f"{self.provider}{' (stream)' if self.stream else ''}",
+            "tcp_connect_ms": ms(percentile(connect_times, 0.5)),
+            "cold_ms": ms(cold["total"]),
+            "handshake_overhead_ms": ms(cold["total"] - warm_total) if warm_total is not None else None,
+            "ttfb_p50_ms": ms(percentile([s["ttfb"] for s in succeeded if s["ttfb"] is not None], 0.5)),
+            "first_chunk_p50_ms": ms(percentile([s["first_chunk"] for s in succeeded if s["first_chunk"] is not None], 0.5)),
+            "total_p50_ms": ms(warm_total),
+            "total_p95_ms": ms(percentile([sample["total"] for sample in succeeded], 0.95)),
+            "requests_per_s": round(len(succeeded) / wall, 2) if wall else None,
+            "chars_per_s": round(sum(sample["chars"] for sample in succeeded) / wall, 1) if wall else None,
+            "errors": len(samples) - len(succeeded),
+            "peak_memory_kb": round(peak / 1024, 1)
+        }
+
+
+def configure(base_url, concurrency, max_retries):
+    """
+    把全局配置指向模拟服务，只修改内存中的配置，不写回 config.json。
+    """
+    chat.config.openai_api_base = base_url
+    chat.config.deepseek_api_url = f"{base_url}/chat/completions"
+    chat.config.gemini_api_url = f"{base_url}/gemini"
+    chat.config.proxy = ""
+    chat.config.http_pool_size = max(chat.config.http_pool_size, concurrency)
+    chat.config.response_cache_enabled = False
+    chat.config.rate_limit_per_minute = 10 ** 9  # 测试时不限流
+    chat.config.rate_limit_burst = 10 ** 9
+    chat.config.max_retries = max_retries
+
+
+def print_table(results):
+    columns = list(results[0])
+    widths = [max(len(column), *(len(str(result[column])) for result in results)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="聊天客户端各提供商代码路径的延迟和吞吐量基准测试")
+    parser.add_argument("--url", help="已运行的模拟服务地址，默认在进程内启动一个")
+    parser.add_argument("--requests", type=int, default=50, help="每个代码路径的请求数")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发请求数")
+    parser.add_argument("--prompt", default="请描述这张图片。", help="发送的提示词")
+    parser.add_argument("--image", help="随请求发送的图片")
+    parser.add_argument("--paths", help="只测试指定的提供商，逗号分隔")
+    parser.add_argument("--max-retries", type=int, default=0, help="注入错误时的重试次数")
+    parser.add_argument("--json", metavar="文件", help="把结果另存为 JSON")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv[:1])  # 图片编解码插件需要应用实例，测试期间保持引用
+    app.setApplicationName("chat_benchmark")
+    server = None
+    base_url = args.url
+    if not base_url:
+        server = start_server(settings_from_args(args))
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    address = urlsplit(base_url)
+    configure(base_url, args.concurrency, args.max_retries)
+
+    providers = set(args.paths.split(",")) if args.paths else None
+    results = []
+    try:
+        for provider, stream in BENCHMARK_PATHS:
+            if providers is None or provider in providers:
+                benchmark = PathBenchmark(provider, stream, args.prompt, args.image)
+                results.append(benchmark.run(args.requests, args.concurrency, address.hostname, address.port or 80))
+    finally:
+        chat.session_pool.close()
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    if results:
+        print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+import sys
+import hmac
+import json
+import queue
+import logging
+import argparse
+import configparser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from PyQt5.QtCore import Qt
+
+from IRS import DatabaseWorker, ResultCache, SingleFlight, PlanInspector, PartitionedScanner
+
+
+class WorkerSession:
+    """
+    连接池中的一个数据库会话：包装一个 DatabaseWorker (独占一个数据库连接)，
+    把它的信号同步收集为返回值，供 HTTP 请求线程直接调用。
+    """
+
+    def __init__(self, db_config, statement_cache_size=32, plan_inspector=None, single_flight=None,
+                 partitioned_scanner=None):
+        """
+        初始化会话。
+
+        Args:
+            db_config (dict): 数据库连接参数 (host, port, user, password, database)。
+            statement_cache_size (int): 预处理语句缓存容量。
+            plan_inspector (PlanInspector): 各会话共享的执行计划检查。
+            single_flight (SingleFlight): 各会话共享的单表查询合并器。
+            partitioned_scanner (PartitionedScanner): 各会话共享的分区扫描 (共享并发上限)。
+        """
+        self.worker = DatabaseWorker(statement_cache_size=statement_cache_size, plan_inspector=plan_inspector,
+                                     single_flight=single_flight, partitioned_scanner=partitioned_scanner,
+                                     **db_config)
+        self.connected = False
+        self.results = []  # 本次请求的查询结果
+        self.errors = []  # 本次请求的错误信息
+        self.updates = []  # 本次请求的更新信息
+        self.warnings = []  # 本次请求的执行计划告警
+        # 信号在调用线程内直接投递，不依赖 Qt 事件循环
+        self.worker.result_signal.connect(self._on_result, type=Qt.DirectConnection)
+        self.worker.error_signal.connect(self.errors.append, type=Qt.DirectConnection)
+        self.worker.update_signal.connect(self.updates.append, type=Qt.DirectConnection)
+        self.worker.plan_warning_signal.connect(self.warnings.append, type=Qt.DirectConnection)
+        self.worker.connection_signal.connect(self._on_connection, type=Qt.DirectConnection)
+
+    def open(self):
+        """
+        在当前线程内同步连接数据库并预加载表字段。
+        """
+        self._reset()
+        self.worker.run()
+        if not self.connected:
+            raise RuntimeError("; ".join(self.errors) or "数据库连接失败")
+
+    def lookup(self, text):
+        """
+        执行查询。
+
+        Args:
+            text (str): 查询内容。
+
+        Returns:
+            tuple: (查询结果列表, 执行计划告警列表, 错误信息列表)。
+        """
+        self._reset()
+        self.worker.execute_query(text)
+        return list(self.results), list(self.warnings), list(self.errors)
+
+    def update(self, table_name, update_column, update_value, conditions):
+        """
+        执行更新。
+
+        Returns:
+            tuple: (更新信息列表, 错误信息列表)。
+        """
+        self._reset()
+        self.worker.execute_update(table_name, update_column, update_value, conditions)
+        return list(self.updates), list(self.errors)
+
+    def close(self):
+        """
+        关闭数据库连接。
+        """
+        if self.worker.conn is not None and self.worker.conn.is_connected():
+            self.worker.conn.close()
+
+    def _reset(self):
+        self.results.clear()
+        self.errors.clear()
+        self.updates.clear()
+        self.warnings.clear()
+
+    def _on_result(self, result):
+        self.results.append(result.to_dict())  # 按列传输，客户端无需再转置
+
+    def _on_connection(self, success):
+        self.connected = success
+
+
+class LookupService:
+    """
+    守护进程的查询服务：共享连接池、共享结果缓存，并合并并发的相同查询。
+    """
+
+    def __init__(self, db_config, pool_size=4, statement_cache_size=32, cache_size=1024, cache_ttl=300,
+                 plan_inspector=None, partitioned_scanner=None):
+        """
+        初始化查询服务并建立连接池。
+
+        Args:
+            db_config (dict): 数据库连接参数。
+            pool_size (int): 连接池大小。
+            statement_cache_size (int): 每个连接的预处理语句缓存容量。
+            cache_size (int): 结果缓存条目数。
+            cache_ttl (float): 结果缓存有效期 (秒)。
+            plan_inspector (PlanInspector): 执行计划检查，各会话共享同一份结论缓存。
+            partitioned_scanner (PartitionedScanner): 大表子串查询的分区扫描，各会话共享并发上限。
+        """
+        self.pool = queue.Queue()
+        self.sessions = []
+        self.query_flights = SingleFlight()  # 单表查询级别的合并，跨连接共享
+        for _ in range(max(1, pool_size)):
+            session = WorkerSession(db_config, statement_cache_size, plan_inspector, self.query_flights,
+                                    partitioned_scanner)
+            session.open()
+            self.sessions.append(session)
+            self.pool.put(session)
+        self.cache = ResultCache(cache_size, cache_ttl)
+        self.flights = SingleFlight()
+
+    @property
+    def table_columns(self):
+        return self.sessions[0].worker._table_columns
+
+    @property
+    def table_conditions(self):
+        return self.sessions[0].worker._table_conditions
+
+    def lookup(self, text):
+        """
+        查询，优先使用共享缓存；并发的相同查询只访问一次数据库。
+
+        Args:
+            text (str): 查询内容。
+
+        Returns:
+            dict: 查询结果、错误信息及是否命中缓存。
+        """
+        cached = self.cache.get(("lookup", text))
+        if cached is not None:
+            return dict(cached, cached=True)
+
+        generation = self.cache.generation  # 查询期间有更新时不缓存本次结果
+
+        def run():
+            session = self.pool.get()
+            try:
+                results, warnings, errors = session.lookup(text)
+            finally:
+                self.pool.put(session)
+            response = {"results": results, "warnings": warnings, "errors": errors}
+            if not errors:
+                self.cache.put(("lookup", text), response, generation)  # 只缓存完整成功的结果
+            return response
+
+        return dict(self.flights.do(("lookup", text), run), cached=False)
+
+    def update(self, table_name, update_column, update_value, conditions):
+        """
+        校验并执行更新，成功后使共享缓存失效。
+
+        Returns:
+            dict: 更新信息和错误信息。
+        """
+        if table_name not in self.table_columns or update_column not in self.table_columns[table_name]:
+            raise ValueError(f"不允许更新表 '{table_name}' 的列 '{update_column}'")
+        if not conditions:
+            raise ValueError("请至少添加一个条件")
+        for column in conditions:
+            if column not in self.table_conditions.get(table_name, []):
+                raise ValueError(f"条件列 '{column}' 不允许用于表 '{table_name}'")
+        if update_value == "":
+            raise ValueError("更新值不能为空")
+
+        session = self.pool.get()
+        try:
+            updates, errors = session.update(table_name, update_column, update_value, conditions)
+        finally:
+            self.pool.put(session)
+        self.cache.invalidate()
+        return {"message": updates[0] if updates else "", "errors": errors}
+
+    def metrics(self):
+        """
+        获取服务运行指标。
+        """
+        return {
+            "result_cache": self.cache.stats(),
+            "coalescing": self.flights.stats(),
+            "query_coalescing": self.query_flights.stats(),
+            "pool_size": len(self.sessions),
+            "sessions": [session.worker.get_metrics() for session in self.sessions]
+        }
+
+    def close(self):
+        for session in self.sessions:
+            session.close()
+
+
+class LookupRequestHandler(BaseHTTPRequestHandler):
+    """
+    本地 HTTP/JSON 接口：
+        GET  /health   健康检查
+        GET  /schema   表字段和允许的条件列
+        GET  /metrics  缓存、合并和连接池指标
+        POST /query    {"text": "..."}
+        POST /update   {"table": "...", "column": "...", "value": "...", "conditions": {...}}
+
+    POST 请求体必须是 Content-Type 为 application/json 的 JSON 对象；带 Origin 头的请求 (来自浏览器网页) 一律拒绝，
+    /update 还要求请求头 X-IRS-Token 与 [DAEMON] token 一致，未配置 token 时禁止更新。
+    """
+
+    service = None  # LookupService 实例，由 serve() 设置
+    token = ""  # 更新接口的共享令牌，由 serve() 设置
+
+    def do_GET(self):
+        if self.headers.get("Origin") is not None:
+            self._send(403, {"error": "不接受来自网页的跨域请求"})
+        elif self.path == "/health":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/schema":
+            self._send(200, {"columns": self.service.table_columns, "conditions": self.service.table_conditions})
+        elif self.path == "/metrics":
+            self._send(200, self.service.metrics())
+        else:
+            self._send(404, {"error": f"未知接口: {self.path}"})
+
+    def do_POST(self):
+        # 网页可以不经预检发送 text/plain 的跨站 POST，因此同时检查 Origin 和 Content-Type
+        if self.headers.get("Origin") is not None:
+            self._send(403, {"error": "不接受来自网页的跨域请求"})
+            return
+        if self.headers.get("Content-Type", "").split(";")[0].strip().lower() != "application/json":
+            self._send(415, {"error": "请求体必须是 application/json"})
+            return
+        if self.path == "/update" and not self._authorized():
+            self._send(403, {"error": "更新接口未启用或令牌无效"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length).decode('utf-8') or "{}")
+            if not isinstance(payload, dict):
+                raise ValueError("请求体必须是 JSON 对象")
+            if self.path == "/query":
+                text = str(payload.get("text", "")).strip()
+                if not text:
+                    raise ValueError("查询内容不能为空")
+                self._send(200, self.service.lookup(text))
+            elif self.path == "/update":
+                self._send(200, self.service.update(payload.get("table", ""), payload.get("column", ""),
+                                                    str(payload.get("value", "")).strip(),
+                                                    payload.get("conditions") or {}))
+            else:
+                self._send(404, {"error": f"未知接口: {self.path}"})
+        except (ValueError, TypeError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            logging.exception(f"处理请求 {self.path} 时发生未知错误")
+            self._send(500, {"error": f"服务器内部错误: {e}"})
+
+    def _authorized(self):
+        """
+        检查请求头中的更新令牌，未配置令牌时一律拒绝。
+        """
+        if not self.token:
+            return False
+        return hmac.compare_digest(self.headers.get("X-IRS-Token", "").encode('utf-8'), self.token.encode('utf-8'))
+
+    def _send(self, status, body):
+        data = json.dumps(body, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} - {format % args}")
+
+
+def load_config(filename='config.ini'):
+    """
+    读取数据库和守护进程配置。
+
+    Returns:
+        tuple: (数据库连接参数, 配置对象)。
+    """
+    config = configparser.ConfigParser()
+    if not config.read(filename):
+        raise FileNotFoundError("配置文件不存在")
+    if not config.has_section('DATABASE'):
+        raise ValueError("缺少[DATABASE]配置节")
+    db_config = {key: config.get('DATABASE', key) for key in ('host', 'port', 'user', 'password', 'database')}
+    return db_config, config
+
+
+def serve(config_file='config.ini'):
+    """
+    启动查询守护进程，只监听本地地址。
+    """
+    db_config, config = load_config(config_file)
+    host = config.get('DAEMON', 'host', fallback='127.0.0.1')
+    port = config.getint('DAEMON', 'port', fallback=8765)
+    service = LookupService(
+        db_config,
+        pool_size=config.getint('DAEMON', 'pool_size', fallback=4),
+        statement_cache_size=config.getint('PERFORMANCE', 'statement_cache_size', fallback=32),
+        cache_size=config.getint('DAEMON', 'cache_size', fallback=1024),
+        cache_ttl=config.getfloat('DAEMON', 'cache_ttl', fallback=300),
+        plan_inspector=PlanInspector(config.getint('PLAN', 'max_scan_rows', fallback=100000),
+                                     config.get('PLAN', 'mode', fallback='warn').strip().lower()),
+        partitioned_scanner=PartitionedScanner(
+            db_config,
+            partitions=config.getint('SCAN', 'partitions', fallback=8),
+            max_concurrency=config.getint('SCAN', 'max_concurrency', fallback=4),
+            min_rows=config.getint('SCAN', 'min_rows', fallback=200000)
+        ) if config.getboolean('SCAN', 'enabled', fallback=False) else None
+    )
+    LookupRequestHandler.service = service
+    LookupRequestHandler.token = config.get('DAEMON', 'token', fallback='').strip()
+    if not LookupRequestHandler.token:
+        logging.warning("[DAEMON] 未配置 token，更新接口已禁用")
+    server = ThreadingHTTPServer((host, port), LookupRequestHandler)
+    server.daemon_threads = True
+    logging.info(f"查询守护进程已启动: http://{host}:{port}")
+    print(f"查询守护进程已启动: http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logging.info(f"运行指标: {json.dumps(service.metrics(), ensure_ascii=False)}")
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IRS 查询守护进程")
+    parser.add_argument("--config", default="config.ini", help="配置文件路径")
+    args = parser.parse_args()
+    try:
+        serve(args.config)
+    except Exception as e:
+        logging.error(f"查询守护进程启动失败: {e}")
+        print(f"查询守护进程启动失败: {e}", file=sys.stderr)
+        sys.exit(1)
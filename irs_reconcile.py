@@ -0,0 +1,282 @@
+import sys
+import csv
+import json
+import logging
+import argparse
+import configparser
+
+import mysql.connector
+
+# 每个表的连接键 (实例 ID) 和需要比对的 IP 列
+TABLE_KEYS = {
+    "ecsstatic": ("instanceId", ["privateIpAddress", "eipAddress"]),
+    "rdsstatic": ("dBInstanceId", ["ipAddress", "eipAddress"]),
+    "slbstatic": ("loadBalancerId", ["slbIp", "eipAddress"]),
+    "ossstatic": ("instanceName", [])
+}
+
+
+def normalize(value):
+    """
+    统一比对用的取值：None 视为空字符串，其余转为去除首尾空白的字符串。
+    """
+    return "" if value is None else str(value).strip()
+
+
+def add_row(rows, duplicates, key, record):
+    """
+    把一行加入哈希表。连接键已存在时保留第一行，后出现的行记入 duplicates。
+    """
+    if key in rows:
+        duplicates.append(record)
+    else:
+        rows[key] = record
+
+
+def load_database_rows(db_config, table_name, key_column, compare_columns, batch_size=5000):
+    """
+    分批读取数据库表，按连接键建立哈希表。
+
+    Args:
+        db_config (dict): 数据库连接参数。
+        table_name (str): 表名。
+        key_column (str): 连接键列。
+        compare_columns (list): 需要比对的列。
+        batch_size (int): 每批读取的行数。
+
+    Returns:
+        tuple: (行字典，key 为连接键；连接键重复的行列表)。
+    """
+    rows, duplicates = {}, []
+    conn = mysql.connector.connect(connection_timeout=5, **db_config)
+    try:
+        cursor = conn.cursor()
+        # 列名来自命令行，先与实际表结构核对，防止拼接出非法 SQL
+        cursor.execute(f"SHOW COLUMNS FROM {table_name}")
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [column for column in [key_column] + compare_columns if column not in existing]
+        if missing:
+            raise ValueError(f"表 {table_name} 不存在列: {', '.join(missing)}")
+
+        columns = [key_column] + compare_columns
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {table_name}")
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for row in batch:
+                record = {column: normalize(value) for column, value in zip(columns, row)}
+                key = record[key_column]
+                if key:
+                    add_row(rows, duplicates, key, record)
+        cursor.close()
+    finally:
+        conn.close()
+    return rows, duplicates
+
+
+def iter_export_rows(path):
+    """
+    逐行读取外部资产导出文件，支持 CSV、JSON 数组和 JSON Lines。
+    """
+    if path.lower().endswith(".csv"):
+        with open(path, newline='', encoding='utf-8-sig') as file:
+            yield from csv.DictReader(file)
+    elif path.lower().endswith(".jsonl"):
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        yield from (data if isinstance(data, list) else data.get("items", []))
+
+
+def load_export_rows(path, key_column, compare_columns, column_map):
+    """
+    读取外部导出文件，按数据库列名重命名后按连接键建立哈希表。
+
+    Args:
+        path (str): 导出文件路径。
+        key_column (str): 连接键列 (数据库列名)。
+        compare_columns (list): 需要比对的列 (数据库列名)。
+        column_map (dict): 导出列名到数据库列名的映射。
+
+    Returns:
+        tuple: (行字典，key 为连接键；连接键重复的行列表)。
+    """
+    rows, duplicates = {}, []
+    columns = [key_column] + compare_columns
+    for raw in iter_export_rows(path):
+        renamed = {column_map.get(name, name): value for name, value in raw.items()}
+        record = {column: normalize(renamed.get(column)) for column in columns}
+        key = record[key_column]
+        if key:
+            add_row(rows, duplicates, key, record)
+    return rows, duplicates
+
+
+def join_rows(database_rows, export_rows, compare_columns):
+    """
+    按连接键做哈希连接：两侧读取时已建成字典，逐个探测另一侧，发现变更即产出。
+
+    Args:
+        database_rows (dict): 数据库一侧的行，key 为连接键。
+        export_rows (dict): 导出文件一侧的行，key 为连接键。
+        compare_columns (list): 需要比对的列。
+
+    Yields:
+        dict: 变更记录。
+    """
+    for key, export_row in export_rows.items():
+        database_row = database_rows.get(key)
+        if database_row is None:
+            continue
+        changes = diff_rows(database_row, export_row, compare_columns)
+        if changes:
+            yield {"status": "changed", "key": key, "matched_on": "id", "changes": changes}
+
+
+def diff_rows(database_row, export_row, columns):
+    """
+    比较两行在指定列上的差异。导出文件中为空的列不参与比较。
+
+    Returns:
+        dict: key 为列名，value 为 {"database": 数据库值, "export": 导出值}。
+    """
+    return {
+        column: {"database": database_row[column], "export": export_row[column]}
+        for column in columns
+        if export_row[column] and database_row[column] != export_row[column]
+    }
+
+
+def match_by_ip(unmatched_database, unmatched_export, key_column, ip_columns):
+    """
+    对实例 ID 未匹配的行再按 IP 列做一次哈希连接，识别 ID 变化但 IP 相同的资产。
+
+    Yields:
+        dict: 报告记录。
+    """
+    ip_index = {}
+    for row in unmatched_database:
+        for column in ip_columns:
+            if row[column]:
+                ip_index.setdefault((column, row[column]), row)
+
+    matched_database = set()
+    for export_row in unmatched_export:
+        database_row = None
+        for column in ip_columns:
+            candidate = ip_index.get((column, export_row[column])) if export_row[column] else None
+            if candidate is not None and candidate[key_column] not in matched_database:
+                database_row = candidate
+                break
+        if database_row is None:
+            yield {"status": "added", "key": export_row[key_column], "export": export_row}
+            continue
+        matched_database.add(database_row[key_column])
+        changes = diff_rows(database_row, export_row, [key_column] + ip_columns)
+        yield {"status": "changed", "key": database_row[key_column], "matched_on": "ip", "changes": changes}
+
+    for row in unmatched_database:
+        if row[key_column] not in matched_database:
+            yield {"status": "removed", "key": row[key_column], "database": row}
+
+
+def reconcile(db_config, table_name, export_path, output, key_column=None, compare_columns=None,
+              column_map=None):
+    """
+    比对数据库表与外部资产导出，把新增、删除、变更和连接键重复的记录以 JSON Lines 流式写出。
+
+    Args:
+        db_config (dict): 数据库连接参数。
+        table_name (str): 表名。
+        export_path (str): 外部导出文件路径。
+        output: 以文本模式打开的输出文件对象。
+        key_column (str): 连接键列，默认使用表的实例 ID 列。
+        compare_columns (list): 比对列，默认使用表的 IP 列。
+        column_map (dict): 导出列名到数据库列名的映射。
+
+    Returns:
+        dict: 各类记录的数量。
+    """
+    default_key, default_compare = TABLE_KEYS.get(table_name, (None, []))
+    key_column = key_column or default_key
+    if not key_column:
+        raise ValueError(f"表 {table_name} 未定义连接键，请通过 --key 指定")
+    compare_columns = compare_columns if compare_columns is not None else default_compare
+    ip_columns = [column for column in default_compare if column in compare_columns]
+
+    database_rows, database_duplicates = load_database_rows(db_config, table_name, key_column, compare_columns)
+    export_rows, export_duplicates = load_export_rows(export_path, key_column, compare_columns, column_map or {})
+    logging.info(f"对账 {table_name}: 数据库 {len(database_rows)} 行，导出文件 {len(export_rows)} 行")
+
+    counts = {"added": 0, "removed": 0, "changed": 0, "duplicate": 0}
+
+    def emit(record):
+        counts[record["status"]] += 1
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    # 同一侧连接键重复时只有第一行参与连接，其余行单独报告，不会被静默覆盖
+    for side, duplicates in (("database", database_duplicates), ("export", export_duplicates)):
+        for row in duplicates:
+            emit({"status": "duplicate", "key": row[key_column], side: row})
+
+    # 探测只是字典查找，在本进程内完成；分发到多进程时行数据的序列化开销远大于查找本身
+    for record in join_rows(database_rows, export_rows, compare_columns):
+        emit(record)
+    unmatched_database = [row for key, row in database_rows.items() if key not in export_rows]
+    unmatched_export = [row for key, row in export_rows.items() if key not in database_rows]
+    for record in match_by_ip(unmatched_database, unmatched_export, key_column, ip_columns):
+        emit(record)
+    output.flush()
+    return counts
+
+
+def load_db_config(filename='config.ini'):
+    """
+    读取 [DATABASE] 配置节。
+    """
+    config = configparser.ConfigParser()
+    if not config.read(filename):
+        raise FileNotFoundError("配置文件不存在")
+    if not config.has_section('DATABASE'):
+        raise ValueError("缺少[DATABASE]配置节")
+    return {key: config.get('DATABASE', key) for key in ('host', 'port', 'user', 'password', 'database')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比对 IRS 数据库表与外部资产导出 (CSV/JSON/JSONL)")
+    parser.add_argument("table", choices=sorted(TABLE_KEYS), help="要比对的表")
+    parser.add_argument("export", help="外部资产导出文件")
+    parser.add_argument("-o", "--output", help="报告输出文件 (JSON Lines)，默认输出到标准输出")
+    parser.add_argument("--key", help="连接键列 (数据库列名)")
+    parser.add_argument("--compare", help="比对列，逗号分隔 (数据库列名)")
+    parser.add_argument("--map", action="append", default=[], metavar="导出列=数据库列",
+                        help="导出列名到数据库列名的映射，可重复")
+    parser.add_argument("--config", default="config.ini", help="配置文件路径")
+    args = parser.parse_args()
+
+    invalid = [item for item in args.map if "=" not in item]
+    if invalid:
+        parser.error(f"--map 应为 导出列=数据库列 的形式: {', '.join(invalid)}")
+    column_map = dict(item.split("=", 1) for item in args.map)
+    compare_columns = [c.strip() for c in args.compare.split(",") if c.strip()] if args.compare else None
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        counts = reconcile(load_db_config(args.config), args.table, args.export, output,
+                           key_column=args.key, compare_columns=compare_columns, column_map=column_map)
+    except (mysql.connector.Error, OSError, ValueError) as e:
+        print(f"对账失败: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"对账完成: 新增 {counts['added']}，删除 {counts['removed']}，变更 {counts['changed']}，"
+          f"连接键重复 {counts['duplicate']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class MockSettings:
+    """
+    模拟服务的行为参数，可在运行中修改。
+    """
+
+    def __init__(self, latency=0.2, chunk_delay=0.02, chunks=20, error_rate=0.0, error_status=503,
+                 retry_after=None, reply="这是模拟回复。"):
+        """
+        Args:
+            latency (float): 返回响应头之前的等待时间 (秒)。
+            chunk_delay (float): 流式输出时每个分片之间的间隔 (秒)。
+            chunks (int): 回复拆分的分片数。
+            error_rate (float): 按该比例返回错误响应 (0~1)。
+            error_status (int): 注入错误时的 HTTP 状态码。
+            retry_after (float): 注入错误时附带的 Retry-After 秒数，为 None 时不附带。
+            reply (str): 回复文本，会按分片数重复。
+        """
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunks = max(1, chunks)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.reply = reply
+        self.requests = 0  # 收到的请求数
+        self.errors = 0  # 注入的错误数
+        self._lock = threading.Lock()
+
+    def count(self, error):
+        with self._lock:
+            self.requests += 1
+            if error:
+                self.errors += 1
+
+
+class MockProviderHandler(BaseHTTPRequestHandler):
+    """
+    模拟 API 提供商：
+        POST /chat/completions   OpenAI 兼容格式 (openai、deepseek)，支持 "stream": true 的 SSE 输出
+        POST 其他路径            请求体含 contents 时按 Gemini 格式回复
+        HEAD/GET 任意路径        连接预热和健康检查
+    """
+
+    protocol_version = "HTTP/1.1"  # 保持长连接，与真实服务一致
+    # 响应头和响应体分两次写出，长连接上 Nagle 算法与客户端延迟确认叠加会让每个响应多等约 40ms
+    disable_nagle_algorithm = True
+    settings = None  # MockSettings 实例，由 start_server() 设置
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self._send_json(200, {"status": "ok", "requests": self.settings.requests, "errors": self.settings.errors})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length).decode('utf-8') or "{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "请求体不是合法的 JSON"}})
+            return
+
+        settings = self.settings
+        error = random.random() < settings.error_rate
+        settings.count(error)
+        time.sleep(settings.latency)
+        if error:
+            headers = {"Retry-After": str(settings.retry_after)} if settings.retry_after is not None else {}
+            self._send_json(settings.error_status, {"error": {"message": "模拟错误"}}, headers)
+            return
+
+        pieces = [settings.reply] * settings.chunks
+        if "messages" in payload:
+            if payload.get("stream"):
+                self._send_event_stream(payload.get("model"), pieces)
+            else:
+                self._send_json(200, {
+                    "model": payload.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(pieces)},
+                                 "finish_reason": "stop"}]
+                })
+        elif "contents" in payload:
+            self._send_json(200, {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": "".join(pieces)}]}}]
+            })
+        else:
+            self._send_json(400, {"error": {"message": "请求体缺少 messages 或 contents"}})
+
+    def _send_event_stream(self, model, pieces):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for index, piece in enumerate(pieces):
+            if index:
+                time.sleep(self.settings.chunk_delay)
+            event = {"model": model, "choices": [{"index": 0, "delta": {"content": piece}}]}
+            self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} - {format % args}")
+
+
+def start_server(settings, host="127.0.0.1", port=0):
+    """
+    在后台线程中启动模拟服务。
+
+    Args:
+        settings (MockSettings): 模拟行为参数。
+        host (str): 监听地址。
+        port (int): 监听端口，0 表示随机分配。
+
+    Returns:
+        ThreadingHTTPServer: 已启动的服务，server_address 为实际监听地址。
+    """
+    handler = type("BoundMockProviderHandler", (MockProviderHandler,), {"settings": settings})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_settings_arguments(parser):
+    """
+    添加模拟行为相关的命令行参数，供模拟服务和基准测试共用。
+    """
+    parser.add_argument("--latency", type=float, default=0.2, help="返回响应头之前的等待时间 (秒)")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="流式分片之间的间隔 (秒)")
+    parser.add_argument("--chunks", type=int, default=20, help="回复拆分的分片数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入错误的比例 (0~1)")
+    parser.add_argument("--error-status", type=int, default=503, help="注入错误时的 HTTP 状态码")
+    parser.add_argument("--retry-after", type=float, help="注入错误时附带的 Retry-After 秒数")
+
+
+def settings_from_args(args):
+    return MockSettings(latency=args.latency, chunk_delay=args.chunk_delay, chunks=args.chunks,
+                        error_rate=args.error_rate, error_status=args.error_status, retry_after=args.retry_after)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟 API 提供商 (OpenAI 兼容格式和 Gemini 格式)")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8766, help="监听端口")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+    server = start_server(settings_from_args(args), args.host, args.port)
+    base = f"http://{args.host}:{server.server_address[1]}"
+    print(f"模拟服务已启动: {base}")
+    print(f"  openai_api_base = {base}")
+    print(f"  deepseek_api_url = {base}/chat/completions")
+    print(f"  gemini_api_url = {base}/gemini")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        sys.exit(0)
@@ -0,0 +1,601 @@
+import os
+import re
+import sys
+import math
+import pickle
+import hashlib
+import sqlite3
+import bisect
+import argparse
+import itertools
+import threading
+from datetime import datetime
+
+# 可选字符集
+LOWERCASE = 'abcdefghijklmnopqrstuvwxyz'
+UPPERCASE = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+DIGITS = '0123456789'
+# 字符类的显示名称
+CLASS_NAMES = {'lowercase': '小写字母', 'uppercase': '大写字母', 'digits': '数字', 'symbols': '特殊符号'}
+
+# 导出到文件时每批生成的密码数
+EXPORT_BATCH_SIZE = 100000
+
+# 默认保留的历史记录条数
+DEFAULT_HISTORY_LIMIT = 1000
+# 历史记录每次读取的条数
+HISTORY_PAGE_SIZE = 200
+# 形如 2024、2024-01、2024-01-02 10:30 的关键词除按密码内容外，还按时间前缀查找
+DATE_PREFIX_PATTERN = re.compile(r'\d{4}(-\d{2}(-\d{2}( \d{2}(:\d{2}(:\d{2})?)?)?)?)?')
+
+
+# 数据目录：优先使用环境变量 OPMAK_DIR，默认为用户目录下的 OPMAK
+def default_data_dir():
+    return os.environ.get('OPMAK_DIR') or os.path.join(os.path.expanduser('~'), 'OPMAK')
+
+
+# 按选项组合各字符类，key 为字符类名称，value 为该类的字符；去掉重复和排除的字符，各类之间互不重叠
+def build_classes(lowercase=False, uppercase=False, digits=False, special_symbols='', excluded=''):
+    classes = {}
+    seen = set(excluded)
+    for name, selected, chars in (('lowercase', lowercase, LOWERCASE), ('uppercase', uppercase, UPPERCASE),
+                                  ('digits', digits, DIGITS), ('symbols', True, special_symbols.replace(':', ''))):
+        if not selected:
+            continue
+        chars = ''.join(dict.fromkeys(char for char in chars if char not in seen))
+        seen.update(chars)
+        if chars:
+            classes[name] = chars
+    if not classes:
+        raise ValueError("请至少选择一种字符。")
+    if sum(map(len, classes.values())) > 256:
+        raise ValueError("字符集不能超过 256 个字符。")
+    return classes
+
+
+# 按选项组合字符集，保证每个字符被选中的概率相同
+def build_charset(lowercase=False, uppercase=False, digits=False, special_symbols='', excluded=''):
+    return ''.join(build_classes(lowercase, uppercase, digits, special_symbols, excluded).values())
+
+
+# 生成 count 个 [0, n) 范围内均匀分布的随机字节
+def random_indices(n, count):
+    if not 0 < n <= 256:
+        raise ValueError("字符集大小必须在 1 到 256 之间")
+    # 大于等于 limit 的字节直接丢弃 (拒绝采样)，其余取模后分布均匀
+    limit = 256 - 256 % n
+    table = bytes(b % n for b in range(256))
+    rejected = bytes(range(limit, 256))
+    result = bytearray()
+    while len(result) < count:
+        needed = count - len(result)
+        # 按接受率多读取一些，通常一次即可取够
+        result += os.urandom(needed * 256 // limit + 64).translate(table, rejected)
+    del result[count:]
+    return bytes(result)
+
+
+# 用操作系统的安全随机源生成 size 个字符，逐字符的工作全部在 C 层的 translate 中完成
+def random_text(chars, size):
+    indices = random_indices(len(chars), size)
+    if chars.isascii():
+        return indices.translate(bytes(chars, 'ascii').ljust(256, b'\0')).decode('ascii')
+    return indices.decode('latin-1').translate(dict(enumerate(chars)))
+
+
+# 批量生成密码
+def generate_passwords(chars, length, quantity):
+    text = random_text(chars, length * quantity)
+    return [text[i:i + length] for i in range(0, length * quantity, length)]
+
+
+# 从 os.urandom 批量读取的随机数，用于逐个字符受约束的生成
+class RandomSource:
+    def __init__(self, buffer_size=4096):
+        self.buffer_size = buffer_size
+        self._values = iter(())
+
+    # 返回 [0, n) 内均匀分布的整数，超出 2^32 整数倍的部分拒绝采样；n 更大时由多个 32 位随机数拼接
+    def below(self, n):
+        if n <= 2 ** 32:
+            limit = 2 ** 32 - 2 ** 32 % n
+            while True:
+                value = self._next()
+                if value < limit:
+                    return value % n
+        words = (n.bit_length() + 31) // 32
+        limit = 2 ** (32 * words) - 2 ** (32 * words) % n
+        while True:
+            value = 0
+            for _ in range(words):
+                value = value << 32 | self._next()
+            if value < limit:
+                return value % n
+
+    # 返回 [0, 1) 内均匀分布的 53 位精度浮点数
+    def random(self):
+        return ((self._next() >> 5) * 67108864 + (self._next() >> 6)) / 9007199254740992
+
+    def _next(self):
+        while True:
+            value = next(self._values, None)
+            if value is not None:
+                return value
+            self._values = iter(memoryview(os.urandom(4 * self.buffer_size)).cast('I'))
+
+    # Fisher-Yates 洗牌
+    def shuffle(self, items):
+        for i in range(len(items) - 1, 0, -1):
+            j = self.below(i + 1)
+            items[i], items[j] = items[j], items[i]
+
+
+# 密码组成策略：每类最少字符数、字符不重复、相邻字符不同、最低熵
+class PasswordPolicy:
+    def __init__(self, classes, length, min_per_class=0, no_repeat=False, no_adjacent=False, min_entropy=0):
+        self.classes = classes
+        self.alphabet = ''.join(classes.values())
+        self.length = length
+        self.min_per_class = min_per_class
+        self.no_repeat = no_repeat
+        self.no_adjacent = no_adjacent and not no_repeat  # 字符不重复时相邻字符必然不同
+        self.min_entropy = min_entropy
+        self._table = None  # 按需计算的计数表，见 class_table 和 position_table
+
+    # 没有任何组成约束时可以直接批量生成
+    @property
+    def simple(self):
+        return not (self.min_per_class or self.no_repeat or self.no_adjacent)
+
+    # 检查策略能否满足，不能满足时抛出 ValueError
+    def validate(self):
+        if self.length <= 0:
+            raise ValueError("密码长度必须大于 0。")
+        required = self.min_per_class * len(self.classes)
+        if required > self.length:
+            raise ValueError(f"每类至少 {self.min_per_class} 个字符共需 {required} 位，超过了密码长度 {self.length}。")
+        if self.no_repeat:
+            if self.length > len(self.alphabet):
+                raise ValueError(f"字符不重复时密码长度不能超过字符集大小 {len(self.alphabet)}。")
+            for name, chars in self.classes.items():
+                if self.min_per_class > len(chars):
+                    raise ValueError(f"{CLASS_NAMES[name]}只有 {len(chars)} 个字符，无法做到每类至少 "
+                                     f"{self.min_per_class} 个且不重复。")
+        if self.no_adjacent and not self.position_table()[0][0]:
+            # 逐位计数表中没有可达的起始状态，说明不存在满足要求的密码
+            raise ValueError("字符太少，无法做到相邻字符不同且满足每类至少的字符数。")
+        bits = self.entropy_bits()
+        if bits < self.min_entropy:
+            raise ValueError(f"当前策略的熵约为 {bits:.1f} 位，低于要求的 {self.min_entropy} 位，请增加长度或字符。")
+
+    # 熵为满足策略的密码个数取对数，生成时每个这样的密码出现的概率相同
+    def entropy_bits(self):
+        if self.simple:
+            return self.length * math.log2(len(self.alphabet))
+        if self.no_repeat:
+            return math.log2(max(self.class_table()[0][self.length][-1], 1))
+        levels, scale = self.position_table()
+        return math.log2(levels[0][((0,) * len(self.classes), None)][-1]) + scale
+
+    # 字符不重复时按类计数：rows[i][r] 为第 i 类取 min_per_class、min_per_class + 1 ... r 个时，
+    # 用第 i 类及其后的字符类填满 r 个位置的方式数的累加。密码长度不超过字符集大小，表很小
+    def class_table(self):
+        if self._table is None:
+            following = [1] + [0] * self.length  # 没有剩余字符类时只能填 0 个位置
+            rows = []
+            for chars in reversed(list(self.classes.values())):
+                row = [list(itertools.accumulate(math.comb(r, k) * math.perm(len(chars), k) * following[r - k]
+                                                 for k in range(self.min_per_class, r + 1)))
+                       for r in range(self.length + 1)]
+                following = [cumulative[-1] if cumulative else 0 for cumulative in row]
+                rows.insert(0, row)
+            self._table = rows
+        return self._table
+
+    # 逐位计数：levels[j][(各类已有个数, 上一位的类)] 为第 j 位取各字符类时，填完其后各位的方式数的累加。
+    # 已有个数只记到 min_per_class 为止；只有相邻字符不同时才区分上一位的类，与上一位同类时少一个可选字符。
+    # 每层按最大值缩放避免浮点溢出，scale 为缩掉的位数，计算熵时加回
+    def position_table(self):
+        if self._table is None:
+            sizes = [len(chars) for chars in self.classes.values()]
+            target = (self.min_per_class,) * len(sizes)
+            prevs = range(len(sizes)) if self.no_adjacent else [None]
+            following = {(target, prev): 1.0 for prev in prevs}  # 填完全部位置时每类都要达到最少个数
+            levels = []
+            scale = 0.0
+            for j in range(self.length - 1, -1, -1):
+                level = {}
+                for counts in itertools.product(range(self.min_per_class + 1), repeat=len(sizes)):
+                    # 已有个数超过 j 位或剩余位数不够补足的状态不可达
+                    if sum(counts) > j or sum(target) - sum(counts) > self.length - j:
+                        continue
+                    for prev in prevs if j else [None]:
+                        cumulative = list(itertools.accumulate(
+                            (size - (q == prev)) * following.get((self.advance(counts, q), q if self.no_adjacent
+                                                                  else None), 0.0)
+                            for q, size in enumerate(sizes)))
+                        if cumulative[-1]:
+                            level[(counts, prev)] = cumulative
+                top = max((cumulative[-1] for cumulative in level.values()), default=1.0)
+                level = {state: [weight / top for weight in cumulative] for state, cumulative in level.items()}
+                scale += math.log2(top)
+                following = {state: cumulative[-1] for state, cumulative in level.items()}
+                levels.insert(0, level)
+            self._table = levels, scale
+        return self._table
+
+    # 第 q 类再出现一次后的各类已有个数
+    def advance(self, counts, q):
+        if counts[q] >= self.min_per_class:
+            return counts
+        return counts[:q] + (counts[q] + 1,) + counts[q + 1:]
+
+
+# 布隆过滤器：以固定内存判断密码是否可能出现过，不会漏判，误判率由容量和 error_rate 决定
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+# 按策略生成密码：约束在逐位构造时直接满足，不整条重试；unique 时整批不重复，history_filter 中出现过的密码也会跳过
+class PasswordGenerator:
+    def __init__(self, policy, unique=False, history_filter=None):
+        policy.validate()
+        self.policy = policy
+        self.seen = set() if unique else None  # 已生成密码的哈希值
+        self.history_filter = history_filter
+        self.random = RandomSource()
+        self.generated = 0
+
+    def generate(self, quantity):
+        if self.seen is None and self.history_filter is None:
+            self.generated += quantity
+            return self._candidates(quantity)
+        # 可能的密码数量要明显多于需要的数量，否则去重会越来越慢
+        needed_total = self.generated + quantity + (self.history_filter.count if self.history_filter else 0)
+        if self.policy.entropy_bits() < math.log2(max(needed_total, 1)) + 1:
+            raise ValueError(f"当前策略下可能的密码数量不足以生成 {quantity} 个不重复的密码，请增加长度或字符。")
+        result = []
+        while len(result) < quantity:
+            for password in self._candidates(quantity - len(result)):
+                if self.history_filter is not None and password in self.history_filter:
+                    continue
+                if self.seen is not None:
+                    key = hash(password)
+                    if key in self.seen:
+                        continue
+                    self.seen.add(key)
+                result.append(password)
+        self.generated += quantity
+        return result
+
+    def _candidates(self, quantity):
+        if self.policy.simple:
+            return generate_passwords(self.policy.alphabet, self.policy.length, quantity)
+        return [self._construct() for _ in range(quantity)]
+
+    # 构造一个满足策略的密码，在所有满足策略的密码中均匀抽取：每一步按选后能完成的密码个数加权
+    def _construct(self):
+        policy = self.policy
+        if policy.no_repeat:
+            return self._construct_distinct()
+        levels, _ = policy.position_table()
+        classes = list(policy.classes.values())
+        counts = (0,) * len(classes)
+        prev = None
+        password = []
+        for level in levels:
+            cumulative = level[(counts, prev)]
+            point = self.random.random() * cumulative[-1]
+            q = bisect.bisect_right(cumulative, point)
+            if q == len(cumulative):
+                # 浮点舍入使抽到的值等于总和时取最后一个可选的类
+                q = bisect.bisect_left(cumulative, cumulative[-1])
+            # 同一个随机数在该类区间内的位置决定取哪个字符，类内各字符的区间等长
+            start = cumulative[q - 1] if q else 0.0
+            chars = classes[q]
+            size = len(chars) - (q == prev)
+            char = chars[min(int((point - start) / (cumulative[q] - start) * size), size - 1)]
+            if q == prev and char == password[-1]:
+                # 与上一位同类时在其余字符中选取：抽到上一位的字符时换成末尾那个 (末尾本身不在抽取范围内)
+                char = chars[-1]
+            password.append(char)
+            counts = policy.advance(counts, q)
+            if policy.no_adjacent:
+                prev = q
+        return ''.join(password)
+
+    # 字符不重复时先抽取各类的个数，再把各类随机分配到位置上，类内不放回抽样
+    def _construct_distinct(self):
+        policy = self.policy
+        positions = list(range(policy.length))
+        self.random.shuffle(positions)
+        password = [''] * policy.length
+        remaining = policy.length
+        for row, chars in zip(policy.class_table(), policy.classes.values()):
+            cumulative = row[remaining]
+            k = policy.min_per_class + bisect.bisect_right(cumulative, self.random.below(cumulative[-1]))
+            pool = list(chars)
+            for position in positions[remaining - k:remaining]:
+                index = self.random.below(len(pool))
+                password[position] = pool[index]
+                pool[index] = pool[-1]
+                pool.pop()
+            remaining -= k
+        return ''.join(password)
+
+
+# 把大量密码分批生成并直接写入文件，progress 回调参数为已完成数量
+def write_passwords(file, generator, quantity, progress=None):
+    done = 0
+    while done < quantity:
+        batch = min(EXPORT_BATCH_SIZE, quantity - done)
+        file.write('\n'.join(generator.generate(batch)) + '\n')
+        done += batch
+        if progress:
+            progress(done)
+
+
+# 读取保存的界面设置，没有时返回空字典
+def load_settings(data_dir):
+    try:
+        with open(os.path.join(data_dir, 'config.dat'), 'rb') as file:
+            return pickle.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+# 保存界面设置
+def save_settings(data_dir, settings):
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, 'config.dat'), 'wb') as file:
+        pickle.dump(settings, file)
+
+
+# 密码历史记录库，可在多个线程中使用
+class HistoryStore:
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.fts = False  # SQLite 是否支持 FTS5 trigram 分词
+        self._conn = None  # 首次使用时打开
+        self._bloom = None  # 历史密码的布隆过滤器，首次需要时建立
+        self._lock = threading.Lock()
+
+    # 打开历史记录库，首次打开时迁移旧的 password_history.dat
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(self.data_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.data_dir, 'password_history.db'), check_same_thread=False)
+            # WAL 模式下每次提交都是原子的，写入中途崩溃不会损坏已有记录
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # 编号自增且只从最小端删除，保证编号连续，裁剪时可以直接按编号范围删除
+            conn.execute("CREATE TABLE IF NOT EXISTS history (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "created TEXT NOT NULL, password TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS history_created ON history (created)")
+            self._create_index(conn)
+            conn.commit()
+            self._migrate(conn)
+            self._conn = conn
+        return self._conn
+
+    # 建立密码内容的 trigram 全文索引，由触发器随插入和删除同步维护
+    def _create_index(self, conn):
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'history_fts'").fetchone()
+        try:
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5("
+                         "password, content='history', content_rowid='id', tokenize='trigram')")
+        except sqlite3.OperationalError:
+            self.fts = False  # 旧版 SQLite 没有 FTS5 或 trigram，搜索退化为分页 LIKE
+            return
+        conn.execute("CREATE TRIGGER IF NOT EXISTS history_insert AFTER INSERT ON history BEGIN "
+                     "INSERT INTO history_fts (rowid, password) VALUES (new.id, new.password); END")
+        conn.execute("CREATE TRIGGER IF NOT EXISTS history_delete AFTER DELETE ON history BEGIN "
+                     "INSERT INTO history_fts (history_fts, rowid, password) VALUES ('delete', old.id, old.password); END")
+        if not exists:
+            conn.execute("INSERT INTO history_fts (history_fts) VALUES ('rebuild')")
+        self.fts = True
+
+    # 把旧版文本历史记录导入数据库，导入后重命名为 .bak
+    def _migrate(self, conn):
+        old_file = os.path.join(self.data_dir, 'password_history.dat')
+        if not os.path.exists(old_file):
+            return
+        # 数据库已有记录说明上次导入后未来得及重命名，不再重复导入
+        if conn.execute("SELECT 1 FROM history LIMIT 1").fetchone() is None:
+            rows = []
+            with open(old_file, 'r') as file:
+                for line in file:
+                    parts = line.rstrip('\n').split(': ', 1)
+                    if len(parts) == 2:
+                        rows.append((parts[0], parts[1]))
+            with conn:
+                conn.executemany("INSERT INTO history (created, password) VALUES (?, ?)", rows)
+        os.replace(old_file, old_file + '.bak')
+
+    # 追加历史记录并裁剪到上限，耗时只与本次写入的条数有关
+    def record(self, passwords, limit=DEFAULT_HISTORY_LIMIT):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany("INSERT INTO history (created, password) VALUES (?, ?)",
+                                 ((now, password) for password in passwords))
+                self._trim(conn, limit)
+            if self._bloom is not None:
+                for password in passwords:
+                    self._bloom.add(password)
+
+    # 历史密码的布隆过滤器，用于生成时排除历史中出现过的密码；超出容量时重建以保持误判率
+    def bloom_filter(self):
+        with self._lock:
+            conn = self._connect()
+            if self._bloom is None or self._bloom.count > self._bloom.capacity:
+                count = conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+                bloom = BloomFilter(max(count * 2, DEFAULT_HISTORY_LIMIT))
+                for (password,) in conn.execute("SELECT password FROM history"):
+                    bloom.add(password)
+                self._bloom = bloom
+            return self._bloom
+
+    # 上限调低后按编号范围删除多出的记录
+    def trim(self, limit=DEFAULT_HISTORY_LIMIT):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                self._trim(conn, limit)
+
+    @staticmethod
+    def _trim(conn, limit):
+        last_id = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'history'").fetchone()
+        if last_id is not None:
+            conn.execute("DELETE FROM history WHERE id <= ?", (last_id[0] - limit,))
+
+    # 清除全部历史记录
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM history")
+            self._bloom = None
+
+    # 按编号倒序读取一页历史记录，每项为 (编号, 时间, 密码)；before_id 为上一页最后一条的编号
+    def query(self, keyword='', before_id=None, limit=HISTORY_PAGE_SIZE):
+        keyword = keyword.strip()
+        before_id = before_id if before_id is not None else 2 ** 63 - 1
+        with self._lock:
+            # 还没有任何历史记录时直接返回，只查询不应创建数据目录和数据库
+            if self._conn is None and not any(os.path.exists(os.path.join(self.data_dir, name))
+                                              for name in ('password_history.db', 'password_history.dat')):
+                return []
+            conn = self._connect()
+            if not keyword:
+                return conn.execute("SELECT id, created, password FROM history WHERE id < ? "
+                                    "ORDER BY id DESC LIMIT ?", (before_id, limit)).fetchall()
+            rows = self._match_password(conn, keyword, before_id, limit)
+            if DATE_PREFIX_PATTERN.fullmatch(keyword):
+                # 时间前缀转换为 created 索引上的范围查询；"2024" 这类关键词也可能是密码内容，两边结果按编号合并
+                dated = conn.execute("SELECT id, created, password FROM history WHERE created >= ? AND created < ? "
+                                     "AND id < ? ORDER BY id DESC LIMIT ?",
+                                     (keyword, keyword + '\uffff', before_id, limit)).fetchall()
+                rows = sorted({row[0]: row for row in rows + dated}.values(), reverse=True)[:limit]
+            return rows
+
+    # 按密码内容查找，每项为 (编号, 时间, 密码)，按编号倒序
+    def _match_password(self, conn, keyword, before_id, limit):
+        if self.fts and len(keyword) >= 3:
+            return conn.execute("SELECT h.id, h.created, h.password FROM history_fts "
+                                "JOIN history h ON h.id = history_fts.rowid "
+                                "WHERE history_fts MATCH ? AND h.id < ? ORDER BY h.id DESC LIMIT ?",
+                                ('"' + keyword.replace('"', '""') + '"', before_id, limit)).fetchall()
+        # trigram 至少需要 3 个字符，更短的关键词从最新的记录开始扫描，取满一页即停止
+        pattern = '%' + keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return conn.execute("SELECT id, created, password FROM history WHERE password LIKE ? ESCAPE '\\' "
+                            "AND id < ? ORDER BY id DESC LIMIT ?", (pattern, before_id, limit)).fetchall()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="随机密码生成 (命令行)，未指定的选项沿用界面保存的设置")
+    parser.add_argument("-l", "--length", type=int, help="密码长度")
+    parser.add_argument("-n", "--count", type=int, help="密码数量")
+    parser.add_argument("--lower", action="store_true", help="包含小写字母")
+    parser.add_argument("--upper", action="store_true", help="包含大写字母")
+    parser.add_argument("--digits", action="store_true", help="包含数字")
+    parser.add_argument("--symbols", help="包含的特殊符号")
+    parser.add_argument("--exclude", help="排除的字符")
+    parser.add_argument("--min-per-class", type=int, help="每类字符至少出现的次数")
+    parser.add_argument("--no-repeat", action="store_true", help="密码内字符不重复")
+    parser.add_argument("--no-adjacent", action="store_true", help="相邻字符不同")
+    parser.add_argument("--min-entropy", type=float, help="最低熵 (位)，策略达不到时报错")
+    parser.add_argument("--unique", action="store_true", help="本批密码互不重复")
+    parser.add_argument("--unique-history", action="store_true", help="不生成历史记录中出现过的密码")
+    parser.add_argument("-o", "--output", help="输出文件，默认输出到标准输出")
+    parser.add_argument("--history", action="store_true", help="记录到历史记录")
+    parser.add_argument("--history-limit", type=int, help="历史记录上限")
+    parser.add_argument("--search", metavar="关键词", nargs="?", const="", help="查询历史记录 (时间前缀或密码内容)，不生成密码")
+    parser.add_argument("--data-dir", default=default_data_dir(), help="数据目录，默认 $OPMAK_DIR 或 ~/OPMAK")
+    args = parser.parse_args(argv)
+
+    settings = load_settings(args.data_dir)
+    history_limit = args.history_limit or int(settings.get('history_limit') or DEFAULT_HISTORY_LIMIT)
+    history = HistoryStore(args.data_dir)
+    try:
+        if args.search is not None:
+            for _, created, password in history.query(args.search):
+                print(f'{created}: {password}')
+            return 0
+
+        # 命令行没有指定任何字符集时使用保存的设置
+        if args.lower or args.upper or args.digits or args.symbols:
+            options = (args.lower, args.upper, args.digits, args.symbols or '')
+        else:
+            options = (settings.get('include_lowercase', True), settings.get('include_uppercase', True),
+                       settings.get('include_digits', True),
+                       settings.get('special_symbols', '') if settings.get('include_special_symbols') else '')
+        classes = build_classes(*options, excluded=args.exclude if args.exclude is not None
+                                else settings.get('excluded_chars', ''))
+        # 显式给出的 0 也要交给校验，不能被保存的设置替换
+        length = args.length if args.length is not None else int(settings.get('length') or 16)
+        count = args.count if args.count is not None else int(settings.get('quantity') or 1)
+        if count < 0:
+            raise ValueError("密码数量不能为负数。")
+        policy = PasswordPolicy(
+            classes, length,
+            min_per_class=args.min_per_class if args.min_per_class is not None
+            else int(settings.get('min_per_class') or 0),
+            no_repeat=args.no_repeat or settings.get('no_repeat', False),
+            no_adjacent=args.no_adjacent or settings.get('no_adjacent', False),
+            min_entropy=args.min_entropy if args.min_entropy is not None
+            else float(settings.get('min_entropy') or 0))
+        generator = PasswordGenerator(policy, unique=args.unique or settings.get('unique', False),
+                                      history_filter=history.bloom_filter() if args.unique_history
+                                      or settings.get('unique_history') else None)
+
+        output = open(args.output, 'w', encoding='utf-8', newline='\n') if args.output else sys.stdout
+        try:
+            if args.history:
+                passwords = generator.generate(count)
+                output.write(''.join(password + '\n' for password in passwords))
+                history.record(passwords, history_limit)
+            elif args.output:
+                write_passwords(output, generator, count,
+                                lambda done: print(f"已生成 {done}/{count}", file=sys.stderr))
+            else:
+                write_passwords(output, generator, count)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+    except (OSError, ValueError) as e:
+        print(f"生成失败: {e}", file=sys.stderr)
+        return 1
+    finally:
+        history.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,24 @@
 import sys
 import os
+import argparse
+import html
 import base64
+import hashlib
 import json
+import time
+import random
+import sqlite3
+import email.utils
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import requests
+from requests.adapters import HTTPAdapter
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout,
                              QTextEdit, QPushButton, QFileDialog, QLabel, QDialog,
-                             QFormLayout, QLineEdit, QComboBox, QMessageBox)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
-from PyQt5.QtGui import QPixmap, QImage
+                             QFormLayout, QLineEdit, QComboBox, QMessageBox, QListWidget)
+from PyQt5.QtCore import Qt, QObject, QThread, QCoreApplication, pyqtSignal, QBuffer, QIODevice
+from PyQt5.QtGui import QPixmap, QImage, QTextCursor
 
 # -------------------- 配置类 --------------------
 class Config:
@@ -18,6 +29,34 @@ class Config:
         self.openai_api_base = "https://api.openai.com/v1" # OpenAI API Base URL，可以配置
         self.gemini_api_key = "" # Gemini API Key
         self.deepseek_api_key = "" # Deepseek API Key
+        self.deepseek_api_url = "YOUR_DEEPSEEK_API_ENDPOINT"  # Deepseek API 端点
+        self.gemini_api_url = "https://7b5krb21xg.apifox.cn"  # Gemini API 端点
+        self.http_pool_size = 4  # 每个提供商的长连接池大小
+        self.prewarm_connections = False  # 启动时是否向当前提供商发送 HEAD 请求，提前建立连接
+        self.connect_timeout = 10  # 连接超时 (秒)
+        self.read_timeout = 120  # 读取超时 (秒)
+        self.stream = True  # 支持流式输出的提供商逐字显示回复
+        self.image_max_side = 1568  # 上传图片的最大边长 (像素)，超出时等比缩小
+        self.image_max_bytes = 1024 * 1024  # 上传图片超过该大小时重新压缩
+        self.image_quality = 85  # 重新压缩为 JPEG 时的质量
+        self.image_cache_bytes = 64 * 1024 * 1024  # 编码后图片缓存的总大小上限
+        self.response_cache_enabled = False  # 是否缓存相同请求的回复
+        self.response_cache_max_entries = 500  # 回复缓存最多条目数
+        self.response_cache_max_bytes = 20 * 1024 * 1024  # 回复缓存总大小上限
+        self.response_cache_ttl = 24 * 3600  # 回复缓存有效期 (秒)
+        self.fanout_mode = "off"  # 多提供商并发：off 关闭，first 取最先成功的回复，all 并排显示全部回复
+        self.fanout_providers = ["openai", "deepseek-r1", "gemini-2.0"]  # 参与并发的提供商
+        self.fanout_max_workers = 3  # 并发请求的线程数上限
+        self.max_concurrent_requests = 2  # 每个提供商同时进行的请求数上限
+        self.rate_limit_per_minute = 20  # 每个提供商每分钟的请求数上限 (令牌桶速率)
+        self.rate_limit_burst = 5  # 令牌桶容量，允许的突发请求数
+        self.max_retries = 3  # 429/5xx 或网络错误时的最大重试次数
+        self.retry_base_delay = 1.0  # 指数退避的基础间隔 (秒)
+        self.retry_max_delay = 30.0  # 单次退避的最长间隔 (秒)
+        self.context_token_budget = {"openai": 4000, "deepseek-r1": 4000, "gemini-2.0": 8000}  # 每个提供商携带的历史上下文 token 上限
+        self.context_image_turns = 1  # 只有最近几轮用户消息的图片随历史发送，更早的图片丢弃
+        self.transcript_page_size = 50  # 聊天记录每次加载的消息条数
+        self.transcript_max_loaded = 300  # 聊天窗口中最多保留的消息条数，超出时移除最早的消息
 
     def save_config(self, filename="config.json"):
         config_data = {
@@ -27,6 +66,34 @@ class Config:
             "openai_api_base": self.openai_api_base,
             "gemini_api_key": self.gemini_api_key,
             "deepseek_api_key": self.deepseek_api_key,
+            "deepseek_api_url": self.deepseek_api_url,
+            "gemini_api_url": self.gemini_api_url,
+            "http_pool_size": self.http_pool_size,
+            "prewarm_connections": self.prewarm_connections,
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.read_timeout,
+            "stream": self.stream,
+            "image_max_side": self.image_max_side,
+            "image_max_bytes": self.image_max_bytes,
+            "image_quality": self.image_quality,
+            "image_cache_bytes": self.image_cache_bytes,
+            "response_cache_enabled": self.response_cache_enabled,
+            "response_cache_max_entries": self.response_cache_max_entries,
+            "response_cache_max_bytes": self.response_cache_max_bytes,
+            "response_cache_ttl": self.response_cache_ttl,
+            "fanout_mode": self.fanout_mode,
+            "fanout_providers": self.fanout_providers,
+            "fanout_max_workers": self.fanout_max_workers,
+            "max_concurrent_requests": self.max_concurrent_requests,
+            "rate_limit_per_minute": self.rate_limit_per_minute,
+            "rate_limit_burst": self.rate_limit_burst,
+            "max_retries": self.max_retries,
+            "retry_base_delay": self.retry_base_delay,
+            "retry_max_delay": self.retry_max_delay,
+            "context_token_budget": self.context_token_budget,
+            "context_image_turns": self.context_image_turns,
+            "transcript_page_size": self.transcript_page_size,
+            "transcript_max_loaded": self.transcript_max_loaded,
         }
         with open(filename, 'w') as f:
             json.dump(config_data, f, indent=4)
@@ -41,6 +108,35 @@ class Config:
                 self.openai_api_base = config_data.get("openai_api_base", "https://api.openai.com/v1")
                 self.gemini_api_key = config_data.get("gemini_api_key", "")
                 self.deepseek_api_key = config_data.get("deepseek_api_key", "")
+                self.deepseek_api_url = config_data.get("deepseek_api_url", "YOUR_DEEPSEEK_API_ENDPOINT")
+                self.gemini_api_url = config_data.get("gemini_api_url", "https://7b5krb21xg.apifox.cn")
+                self.http_pool_size = config_data.get("http_pool_size", 4)
+                self.prewarm_connections = config_data.get("prewarm_connections", False)
+                self.connect_timeout = config_data.get("connect_timeout", 10)
+                self.read_timeout = config_data.get("read_timeout", 120)
+                self.stream = config_data.get("stream", True)
+                self.image_max_side = config_data.get("image_max_side", 1568)
+                self.image_max_bytes = config_data.get("image_max_bytes", 1024 * 1024)
+                self.image_quality = config_data.get("image_quality", 85)
+                self.image_cache_bytes = config_data.get("image_cache_bytes", 64 * 1024 * 1024)
+                self.response_cache_enabled = config_data.get("response_cache_enabled", False)
+                self.response_cache_max_entries = config_data.get("response_cache_max_entries", 500)
+                self.response_cache_max_bytes = config_data.get("response_cache_max_bytes", 20 * 1024 * 1024)
+                self.response_cache_ttl = config_data.get("response_cache_ttl", 24 * 3600)
+                self.fanout_mode = config_data.get("fanout_mode", "off")
+                self.fanout_providers = config_data.get("fanout_providers", ["openai", "deepseek-r1", "gemini-2.0"])
+                self.fanout_max_workers = config_data.get("fanout_max_workers", 3)
+                self.max_concurrent_requests = config_data.get("max_concurrent_requests", 2)
+                self.rate_limit_per_minute = config_data.get("rate_limit_per_minute", 20)
+                self.rate_limit_burst = config_data.get("rate_limit_burst", 5)
+                self.max_retries = config_data.get("max_retries", 3)
+                self.retry_base_delay = config_data.get("retry_base_delay", 1.0)
+                self.retry_max_delay = config_data.get("retry_max_delay", 30.0)
+                self.context_token_budget = config_data.get("context_token_budget",
+                                                            {"openai": 4000, "deepseek-r1": 4000, "gemini-2.0": 8000})
+                self.context_image_turns = config_data.get("context_image_turns", 1)
+                self.transcript_page_size = config_data.get("transcript_page_size", 50)
+                self.transcript_max_loaded = config_data.get("transcript_max_loaded", 300)
         except FileNotFoundError:
             pass  # 使用默认配置
 
@@ -48,6 +144,623 @@ class Config:
 config = Config()
 config.load_config()
 
+# 各提供商使用的模型和请求参数
+PROVIDER_MODELS = {
+    "openai": "gpt-4-vision-preview",  # Or your desired model
+    "deepseek-r1": "deepseek-vl",
+    "gemini-2.0": "gemini-2.0",
+}
+MAX_TOKENS = 300
+
+# -------------------- HTTP 会话池 --------------------
+class SessionPool:
+    """按 API 提供商复用 requests.Session，保持长连接，后续请求不再重复 TCP/TLS 握手和代理 CONNECT"""
+
+    def __init__(self):
+        self._sessions = {}  # key 为提供商，value 为 (会话参数, Session)
+        self._lock = threading.Lock()
+
+    def get(self, provider):
+        # 连接池大小变化后重建会话
+        params = config.http_pool_size
+        with self._lock:
+            entry = self._sessions.get(provider)
+            if entry is not None and entry[0] == params:
+                return entry[1]
+            if entry is not None:
+                entry[1].close()
+            session = self._create_session()
+            self._sessions[provider] = (params, session)
+            return session
+
+    def timeout(self):
+        return (config.connect_timeout, config.read_timeout)
+
+    @staticmethod
+    def proxies():
+        """每次请求单独传入代理：设置在 session.proxies 上时会被 HTTP(S)_PROXY 环境变量覆盖"""
+        return {"http": config.proxy, "https": config.proxy} if config.proxy else {}
+
+    def prewarm(self, provider, url):
+        """在后台预先建立连接，第一条消息也不用等待握手"""
+        def run():
+            try:
+                self.get(provider).head(url, timeout=self.timeout(), proxies=self.proxies())
+            except requests.exceptions.RequestException:
+                pass  # 预热失败不影响正常请求
+        threading.Thread(target=run, daemon=True).start()
+
+    def close(self):
+        with self._lock:
+            for _, session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    @staticmethod
+    def _create_session():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.http_pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+
+# 全局会话池，所有 ApiCallThread 共享
+session_pool = SessionPool()
+
+# -------------------- 限流与重试 --------------------
+class TokenBucket:
+    """令牌桶限流：按固定速率补充令牌，取不到令牌时等待"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate  # 每秒补充的令牌数
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """每个提供商一个令牌桶"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, provider):
+        with self._lock:
+            bucket = self._buckets.get(provider)
+            if bucket is None:
+                bucket = TokenBucket(max(config.rate_limit_per_minute, 1) / 60.0, config.rate_limit_burst)
+                self._buckets[provider] = bucket
+        bucket.acquire()
+
+
+rate_limiter = RateLimiter()
+
+# 需要重试的 HTTP 状态码
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def retry_after_seconds(response):
+    """解析 Retry-After 响应头 (秒数或 HTTP 日期)，没有时返回 None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def post_with_retry(provider, url, cancelled=None, **kwargs):
+    """
+    带限流和重试的 POST 请求：429/5xx 和网络错误按抖动指数退避重试，优先遵循 Retry-After。
+    cancelled 为 threading.Event，设置后不再发起新的尝试，退避等待也会立即结束。
+    """
+    for attempt in range(config.max_retries + 1):
+        if cancelled is not None and cancelled.is_set():
+            raise RuntimeError("已取消")
+        rate_limiter.acquire(provider)
+        try:
+            response = session_pool.get(provider).post(url, timeout=session_pool.timeout(),
+                                                       proxies=session_pool.proxies(), **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt >= config.max_retries:
+                raise
+            delay = None
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= config.max_retries:
+                return response
+            delay = retry_after_seconds(response)
+            response.close()
+        if delay is None:
+            # 全抖动指数退避，避免多个请求同时重试
+            delay = random.uniform(0, min(config.retry_max_delay, config.retry_base_delay * 2 ** attempt))
+        if cancelled is not None:
+            cancelled.wait(delay)
+        else:
+            time.sleep(delay)
+
+# -------------------- 图片预处理 --------------------
+def detect_image_mime(data):
+    """根据文件头判断图片的真实类型"""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data.startswith(b"BM"):
+        return "image/bmp"
+    return "image/jpeg"
+
+
+class ImagePayloadCache:
+    """图片上传前按需缩放、重新压缩并编码为 base64，结果按内容哈希缓存，重复发送同一图片不再读盘和编码"""
+
+    max_hashes = 1024  # 最多记录的文件哈希数，超出时淘汰最久未使用的
+
+    def __init__(self):
+        self._hashes = OrderedDict()  # key 为 (路径, 大小, 修改时间)，value 为内容哈希
+        self._payloads = OrderedDict()  # key 为内容哈希，value 为 (MIME 类型, base64 数据)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def content_hash(self, image_path):
+        """返回图片内容哈希，文件未变化时直接使用已记录的哈希"""
+        stat = os.stat(image_path)
+        stat_key = (os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._lookup_hash(stat_key)
+        if digest is None:
+            with open(image_path, "rb") as image_file:
+                digest = hashlib.sha256(image_file.read()).hexdigest()
+            with self._lock:
+                self._remember_hash(stat_key, digest)
+        return digest
+
+    def _lookup_hash(self, stat_key):
+        """需持有锁调用"""
+        digest = self._hashes.get(stat_key)
+        if digest is not None:
+            self._hashes.move_to_end(stat_key)
+        return digest
+
+    def _remember_hash(self, stat_key, digest):
+        """需持有锁调用"""
+        self._hashes[stat_key] = digest
+        self._hashes.move_to_end(stat_key)
+        while len(self._hashes) > self.max_hashes:
+            self._hashes.popitem(last=False)
+
+    def encode(self, image_path):
+        """返回 (MIME 类型, base64 数据, 内容哈希)"""
+        stat = os.stat(image_path)
+        stat_key = (os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._lookup_hash(stat_key)
+            if digest in self._payloads:
+                self._payloads.move_to_end(digest)
+                return self._payloads[digest] + (digest,)
+
+        with open(image_path, "rb") as image_file:
+            raw = image_file.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            self._remember_hash(stat_key, digest)
+            if digest in self._payloads:  # 同一内容的另一个文件
+                self._payloads.move_to_end(digest)
+                return self._payloads[digest] + (digest,)
+
+        mime_type, data = self.preprocess(raw)
+        payload = (mime_type, base64.b64encode(data).decode('ascii'))
+        with self._lock:
+            self._payloads[digest] = payload
+            self._bytes += len(payload[1])
+            while self._bytes > config.image_cache_bytes and len(self._payloads) > 1:
+                _, (_, old_data) = self._payloads.popitem(last=False)
+                self._bytes -= len(old_data)
+        return payload + (digest,)
+
+    @staticmethod
+    def preprocess(raw):
+        """尺寸或体积超限时缩小并重新压缩，返回 (MIME 类型, 图片数据)"""
+        mime_type = detect_image_mime(raw)
+        image = QImage.fromData(raw)
+        if image.isNull():
+            return mime_type, raw  # 无法解码的格式原样发送
+        oversized = max(image.width(), image.height()) > config.image_max_side
+        if not oversized and len(raw) <= config.image_max_bytes:
+            return mime_type, raw
+
+        if oversized:
+            image = image.scaled(config.image_max_side, config.image_max_side,
+                                 Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        # 带透明通道的图片保留 PNG，其余压缩为 JPEG
+        image_format, new_mime_type = ("PNG", "image/png") if image.hasAlphaChannel() else ("JPEG", "image/jpeg")
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
+        image.save(buffer, image_format, config.image_quality if image_format == "JPEG" else -1)
+        data = bytes(buffer.data())
+        if not data or (not oversized and len(data) >= len(raw)):
+            return mime_type, raw  # 重新压缩没有变小
+        return new_mime_type, data
+
+
+# 全局图片缓存，所有 ApiCallThread 共享
+image_cache = ImagePayloadCache()
+
+
+class ImagePreviewThread(QThread):
+    """在后台读取并缩小待上传图片的预览，大截图不会卡住界面 (QImage 可以在非界面线程中使用，QPixmap 不行)"""
+    loaded = pyqtSignal(str, QImage)  # 图片路径、缩小后的预览
+
+    def __init__(self, image_path, width, height):
+        super().__init__()
+        self.image_path = image_path
+        self.width = width
+        self.height = height
+
+    def run(self):
+        image = QImage(self.image_path)
+        if not image.isNull():
+            image = image.scaled(self.width, self.height, Qt.KeepAspectRatio)
+        self.loaded.emit(self.image_path, image)
+
+# -------------------- 回复缓存 --------------------
+class ResponseCache:
+    """磁盘上的 LRU 回复缓存，限制条目数、总字节数和有效期"""
+
+    def __init__(self, filename="response_cache.db"):
+        self.filename = filename
+        self._conn = None  # 首次使用时打开
+        self._lock = threading.Lock()
+
+    def make_key(self, provider, prompt, image_path=None, params=None):
+        """按 (提供商, 模型, 提示词, 图片内容哈希, 请求参数) 生成缓存键；图片已移动或删除时返回 None，不使用缓存"""
+        try:
+            image_hash = image_cache.content_hash(image_path) if image_path else None
+        except OSError:
+            return None  # 读取图片的错误留给请求本身报告
+        request_params = {"max_tokens": MAX_TOKENS}
+        request_params.update(params or {})
+        key_data = [provider, PROVIDER_MODELS.get(provider), prompt, image_hash, request_params]
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] + config.response_cache_ttl < now:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO responses (key, response, size, created, last_access) "
+                         "VALUES (?, ?, ?, ?, ?)", (key, response, len(response.encode('utf-8')), now, now))
+            conn.execute("DELETE FROM responses WHERE created < ?", (now - config.response_cache_ttl,))
+            # 超出条目数或总大小时，淘汰最久未使用的条目
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            while count > 1 and (count > config.response_cache_max_entries or total > config.response_cache_max_bytes):
+                key_to_evict, size = conn.execute(
+                    "SELECT key, size FROM responses ORDER BY last_access LIMIT 1").fetchone()
+                conn.execute("DELETE FROM responses WHERE key = ?", (key_to_evict,))
+                count, total = count - 1, total - size
+            conn.commit()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.filename, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT, "
+                               "size INTEGER, created REAL, last_access REAL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+            self._conn.commit()
+        return self._conn
+
+
+# 全局回复缓存
+response_cache = ResponseCache()
+
+# -------------------- 聊天记录 --------------------
+# 各角色在聊天窗口中的显示前缀
+ROLE_PREFIXES = {"user": "用户", "assistant": "AI", "error": "错误"}
+
+
+class TranscriptStore:
+    """磁盘上的聊天记录：只追加写入，按编号分页读取，trigram 全文索引支持跨会话搜索"""
+
+    def __init__(self, filename="chat_history.db"):
+        self.filename = filename
+        self.session = str(int(time.time() * 1000))  # 本次运行的会话编号
+        self.fts = False  # SQLite 是否支持 FTS5 trigram 分词
+        self._conn = None  # 首次使用时打开
+        self._lock = threading.Lock()
+
+    def append(self, role, content):
+        """追加一条消息，返回消息编号"""
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute("INSERT INTO messages (session, role, content, created) VALUES (?, ?, ?, ?)",
+                                  (self.session, role, content, time.time()))
+            if self.fts:
+                conn.execute("INSERT INTO messages_fts (rowid, content) VALUES (?, ?)", (cursor.lastrowid, content))
+            conn.commit()
+            return cursor.lastrowid
+
+    def page(self, before_id=None, limit=50):
+        """返回编号小于 before_id 的最近 limit 条消息 (编号, 角色, 内容, 时间)，按时间正序"""
+        with self._lock:
+            conn = self._connect()
+            if before_id is None:
+                rows = conn.execute("SELECT id, role, content, created FROM messages ORDER BY id DESC LIMIT ?",
+                                    (limit,)).fetchall()
+            else:
+                rows = conn.execute("SELECT id, role, content, created FROM messages WHERE id < ? "
+                                    "ORDER BY id DESC LIMIT ?", (before_id, limit)).fetchall()
+        rows.reverse()
+        return rows
+
+    def search(self, text, limit=200):
+        """跨会话搜索，返回最近的 limit 条匹配 (编号, 会话, 角色, 内容, 时间)"""
+        text = text.strip()
+        if not text:
+            return []
+        with self._lock:
+            conn = self._connect()
+            # trigram 分词至少需要 3 个字符，更短的关键字按编号倒序扫描，取满 limit 条即停止
+            if self.fts and len(text) >= 3:
+                return conn.execute(
+                    "SELECT m.id, m.session, m.role, m.content, m.created FROM messages_fts "
+                    "JOIN messages m ON m.id = messages_fts.rowid WHERE messages_fts MATCH ? "
+                    "ORDER BY m.id DESC LIMIT ?", ('"' + text.replace('"', '""') + '"', limit)).fetchall()
+            pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            return conn.execute("SELECT id, session, role, content, created FROM messages "
+                                "WHERE content LIKE ? ESCAPE '\\' ORDER BY id DESC LIMIT ?",
+                                (pattern, limit)).fetchall()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.filename, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                               "session TEXT, role TEXT, content TEXT, created REAL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session, id)")
+            exists = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone()
+            try:
+                self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+                                   "content, content='messages', content_rowid='id', tokenize='trigram')")
+                if not exists:
+                    # 已有记录的库首次建立索引
+                    self._conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+                self.fts = True
+            except sqlite3.OperationalError:
+                self.fts = False  # 旧版 SQLite 没有 FTS5 或 trigram，搜索退化为 LIKE
+            self._conn.commit()
+        return self._conn
+
+
+class TranscriptSearchDialog(QDialog):
+    """跨会话搜索聊天记录"""
+
+    def __init__(self, transcript, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("搜索聊天记录")
+        self.resize(600, 400)
+        self.transcript = transcript
+
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("输入关键字后按回车")
+        self.search_button = QPushButton("搜索")
+        self.result_list = QListWidget()
+        self.status_label = QLabel()
+
+        hbox = QHBoxLayout()
+        hbox.addWidget(self.search_edit)
+        hbox.addWidget(self.search_button)
+        vbox = QVBoxLayout()
+        vbox.addLayout(hbox)
+        vbox.addWidget(self.result_list)
+        vbox.addWidget(self.status_label)
+        self.setLayout(vbox)
+
+        self.search_edit.returnPressed.connect(self.search)
+        self.search_button.clicked.connect(self.search)
+
+    def search(self):
+        start = time.perf_counter()
+        rows = self.transcript.search(self.search_edit.text())
+        self.result_list.clear()
+        for _, _, role, content, created in rows:
+            snippet = " ".join(content.split())
+            self.result_list.addItem(f"[{time.strftime('%Y-%m-%d %H:%M', time.localtime(created))}] "
+                                     f"{ROLE_PREFIXES.get(role, role)}: {snippet[:200]}")
+        self.status_label.setText(f"找到 {len(rows)} 条 ({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+
+# -------------------- 对话上下文 --------------------
+IMAGE_TOKEN_ESTIMATE = 800  # 一张图片按该 token 数估算
+SUMMARY_SNIPPET_CHARS = 80  # 压缩摘要中每轮保留的字符数
+SUMMARY_BUDGET_RATIO = 0.25  # 压缩摘要最多占用的预算比例
+
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中日韩字符按每字 1 个，其余按每 4 个字符 1 个"""
+    wide = sum(1 for char in text if ord(char) > 0x2E7F)
+    return wide + (len(text) - wide) // 4 + 1
+
+
+class Conversation:
+    """多轮对话历史：按提供商的 token 预算选取最近的轮次，更早的轮次压缩为摘要，过期的图片不再发送"""
+
+    def __init__(self):
+        # 每项为 {"role": "user"/"assistant", "text": 文本, "image_path": 图片路径, "pending": 回复是否未完成}
+        self.turns = []
+
+    def begin(self, text, image_path=None):
+        """
+        发送提问时同时记录提问和预留的回复位置，多个请求同时进行时各自的回复不会错位。
+        未完成的一问一答不计入历史，返回的 (提问, 回复) 交给 complete() 或 discard()。
+        """
+        exchange = ({"role": "user", "text": text, "image_path": image_path, "pending": True},
+                    {"role": "assistant", "text": "", "image_path": None, "pending": True})
+        self.turns.extend(exchange)
+        return exchange
+
+    def complete(self, exchange, text):
+        """填入回复原文，这一问一答从此计入历史"""
+        question, answer = exchange
+        answer["text"] = text
+        question["pending"] = answer["pending"] = False
+
+    def discard(self, exchange):
+        """请求失败时移除提问和预留的回复，避免历史中出现连续的提问"""
+        self.turns[:] = [turn for turn in self.turns if not any(turn is item for item in exchange)]
+
+    def clear(self):
+        self.turns.clear()
+
+    def history(self, provider):
+        """返回随下一条消息发送的历史轮次 (不含下一条消息本身)，总量不超过该提供商的预算"""
+        budget = config.context_token_budget.get(provider, 4000)
+        image_turns = config.context_image_turns
+        turns = [turn for turn in self.turns if not turn["pending"]]
+        selected = []
+        used = 0
+        index = len(turns)
+        # 从最近的轮次往前取，直到预算用完
+        while index > 0:
+            turn = turns[index - 1]
+            image_path = turn["image_path"]
+            if turn["role"] == "user" and image_path:
+                if image_turns > 0 and os.path.isfile(image_path):
+                    image_turns -= 1
+                else:
+                    image_path = None  # 过期或已被移动、删除的图片只保留文字
+            cost = estimate_tokens(turn["text"]) + (IMAGE_TOKEN_ESTIMATE if image_path else 0)
+            if used + cost > budget:
+                break
+            selected.append({"role": turn["role"], "text": turn["text"], "image_path": image_path})
+            used += cost
+            index -= 1
+        selected.reverse()
+        # 历史需以用户消息开头，开头的回复并入摘要
+        while selected and selected[0]["role"] != "user":
+            selected.pop(0)
+            index += 1
+
+        # 超出预算的早期轮次压缩为一段摘要，摘要也受预算限制
+        summary = self.summarize(turns[:index], min(budget - used, int(budget * SUMMARY_BUDGET_RATIO)))
+        if summary:
+            selected[:0] = [{"role": "user", "text": summary, "image_path": None},
+                            {"role": "assistant", "text": "好的，我已了解之前的对话。", "image_path": None}]
+        return selected
+
+    @staticmethod
+    def summarize(turns, budget):
+        """把早期轮次截断拼接为摘要，优先保留较近的轮次；预算不足时返回空字符串"""
+        header = "以下是之前对话的摘要：\n"
+        used = estimate_tokens(header)
+        lines = []
+        for turn in reversed(turns):
+            text = " ".join(turn["text"].split())
+            if len(text) > SUMMARY_SNIPPET_CHARS:
+                text = text[:SUMMARY_SNIPPET_CHARS] + "…"
+            line = f"{'用户' if turn['role'] == 'user' else 'AI'}: {text}"
+            cost = estimate_tokens(line)
+            if used + cost > budget:
+                break
+            lines.append(line)
+            used += cost
+        if not lines:
+            return ""
+        return header + "\n".join(reversed(lines))
+
+    @staticmethod
+    def fingerprint(history):
+        """历史轮次的缓存键参数，图片按内容哈希计入；图片在此期间被移动或删除时按路径计入"""
+        def image_key(image_path):
+            if not image_path:
+                return None
+            try:
+                return image_cache.content_hash(image_path)
+            except OSError:
+                return os.path.abspath(image_path)
+
+        return [[turn["role"], turn["text"], image_key(turn["image_path"])] for turn in history]
+
+
+def openai_messages(history, prompt, image_path=None):
+    """构造 OpenAI 兼容接口的 messages：历史轮次加当前提问"""
+    messages = []
+    for turn in (history or []) + [{"role": "user", "text": prompt, "image_path": image_path}]:
+        if turn["role"] == "assistant":
+            messages.append({"role": "assistant", "content": turn["text"]})
+            continue
+        content = []
+        if turn["image_path"]:
+            mime_type, img_base64, _ = image_cache.encode(turn["image_path"])
+            content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:{mime_type};base64,{img_base64}"
+                }
+            })
+        content.append({"type": "text", "text": turn["text"]})
+        messages.append({"role": "user", "content": content})
+    return messages
+
+
+def gemini_contents(history, prompt, image_path=None):
+    """构造 Gemini 接口的 contents：历史轮次加当前提问"""
+    contents = []
+    for turn in (history or []) + [{"role": "user", "text": prompt, "image_path": image_path}]:
+        parts = []
+        if turn["image_path"]:
+            mime_type, img_base64, _ = image_cache.encode(turn["image_path"])
+            parts.append({
+                "inline_data": {
+                    "mime_type": mime_type,
+                    "data": img_base64
+                }
+            })
+        parts.append({"text": turn["text"]})
+        contents.append({"role": "model" if turn["role"] == "assistant" else "user", "parts": parts})
+    return contents
+
 # -------------------- 设置对话框 --------------------
 class SettingsDialog(QDialog):
     def __init__(self, parent=None):
@@ -63,6 +776,8 @@ class SettingsDialog(QDialog):
         self.openai_api_base_edit = QLineEdit(config.openai_api_base)
         self.gemini_api_key_edit = QLineEdit(config.gemini_api_key)
         self.deepseek_api_key_edit = QLineEdit(config.deepseek_api_key)
+        self.deepseek_api_url_edit = QLineEdit(config.deepseek_api_url)
+        self.gemini_api_url_edit = QLineEdit(config.gemini_api_url)
 
         layout = QFormLayout()
         layout.addRow("API Provider:", self.api_provider_combo)
@@ -70,6 +785,8 @@ class SettingsDialog(QDialog):
         layout.addRow("API Key:", self.api_key_edit)
         layout.addRow("Gemini API Key:", self.gemini_api_key_edit)
         layout.addRow("Deepseek API Key:", self.deepseek_api_key_edit)
+        layout.addRow("Deepseek API URL:", self.deepseek_api_url_edit)
+        layout.addRow("Gemini API URL:", self.gemini_api_url_edit)
         layout.addRow("Proxy:", self.proxy_edit)
 
         self.buttons = QHBoxLayout()
@@ -92,141 +809,155 @@ class SettingsDialog(QDialog):
         config.openai_api_base = self.openai_api_base_edit.text() # 保存 OpenAI API Base
         config.gemini_api_key = self.gemini_api_key_edit.text()
         config.deepseek_api_key = self.deepseek_api_key_edit.text()
+        config.deepseek_api_url = self.deepseek_api_url_edit.text()
+        config.gemini_api_url = self.gemini_api_url_edit.text()
         config.save_config() # 保存到文件
         self.accept()
 
 
 # -------------------- API 调用线程 --------------------
+# 流式输出时合并增量文本的时间间隔 (秒)，避免每个 token 都刷新一次界面
+STREAM_FLUSH_INTERVAL = 0.05
+
 class ApiCallThread(QThread):
-    message_received = pyqtSignal(str)
+    message_received = pyqtSignal(str, bool)  # 完整回复、是否来自回复缓存
     error_occurred = pyqtSignal(str)
+    chunk_received = pyqtSignal(str)  # 流式输出的增量文本
+    stream_finished = pyqtSignal(str)  # 流式输出结束，参数为完整回复
 
-    def __init__(self, prompt, image_path=None):
+    def __init__(self, prompt, image_path=None, use_cache=False, history=None):
         super().__init__()
         self.prompt = prompt
         self.image_path = image_path
+        self.use_cache = use_cache  # 是否查询和写入回复缓存
+        self.history = history or []  # 随本次提问发送的历史轮次
+        self.cancelled = threading.Event()  # 设置后停止重试并关闭正在读取的流式响应
 
     def run(self):
         try:
-            if config.api_provider == "openai":
-                response = self.call_openai_api(self.prompt, self.image_path)
-            elif config.api_provider == "deepseek-r1":
-                response = self.call_deepseek_api(self.prompt, self.image_path)
-            elif config.api_provider == "gemini-2.0":
-                response = self.call_gemini_api(self.prompt, self.image_path)
-            else:
+            # OpenAI 兼容接口 (openai、deepseek) 支持 SSE 流式输出
+            stream = config.stream and config.api_provider in ("openai", "deepseek-r1")
+            if config.api_provider not in PROVIDER_MODELS:
                 self.error_occurred.emit("不支持的API提供商")
                 return
+            # 缓存键要读取图片计算内容哈希，在本线程中计算，不阻塞界面
+            cache_key = self.response_cache_key(config.api_provider) if self.use_cache else None
+            cached = response_cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                self.message_received.emit(cached, True)
+                return
+            response = self.call_provider(config.api_provider, self.prompt, self.image_path, stream)
 
-            self.message_received.emit(response)
+            if cache_key:
+                response_cache.put(cache_key, response)
+
+            if stream:
+                self.stream_finished.emit(response)
+            else:
+                self.message_received.emit(response, False)
 
         except Exception as e:
             self.error_occurred.emit(f"API 调用出错: {str(e)}")
 
-    def call_openai_api(self, prompt, image_path=None):
+    def history_for(self, provider):
+        """随发给该提供商的请求一起发送的历史轮次"""
+        return self.history
+
+    def response_cache_key(self, provider):
+        """本次请求在回复缓存中的键，历史轮次一并计入；图片已移动或删除时为 None"""
+        return response_cache.make_key(provider, self.prompt, self.image_path,
+                                       {"history": Conversation.fingerprint(self.history_for(provider))})
+
+    def call_provider(self, provider, prompt, image_path=None, stream=False):
+        if provider == "openai":
+            return self.call_openai_api(prompt, image_path, stream, self.history_for(provider))
+        if provider == "deepseek-r1":
+            return self.call_deepseek_api(prompt, image_path, stream, self.history_for(provider))
+        if provider == "gemini-2.0":
+            return self.call_gemini_api(prompt, image_path, self.history_for(provider))
+        raise ValueError(f"不支持的API提供商: {provider}")
+
+    def read_event_stream(self, response):
+        """逐行解析 SSE 响应，按时间间隔批量发出增量文本，返回完整回复"""
+        response.encoding = "utf-8"
+        parts = []
+        pending = []
+        last_flush = 0.0  # 第一个 token 立即显示
+        for line in response.iter_lines(decode_unicode=True):
+            if self.cancelled.is_set():
+                response.close()  # 断开连接，服务端随之停止生成
+                raise RuntimeError("已取消")
+            if not line or not line.startswith("data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                break
+            choices = json.loads(payload).get("choices") or [{}]
+            delta = choices[0].get("delta", {}).get("content")
+            if not delta:
+                continue
+            parts.append(delta)
+            pending.append(delta)
+            if time.monotonic() - last_flush >= STREAM_FLUSH_INTERVAL:
+                self.chunk_received.emit("".join(pending))
+                pending.clear()
+                last_flush = time.monotonic()
+        if pending:
+            self.chunk_received.emit("".join(pending))
+        return "".join(parts)
+
+    def call_openai_api(self, prompt, image_path=None, stream=False, history=None):
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {config.api_key}"
         }
 
         data = {
-            "model": "gpt-4-vision-preview",  # Or your desired model
-            "messages": [
-                {
-                    "role": "user",
-                    "content": []
-                }
-            ],
-            "max_tokens": 300
+            "model": PROVIDER_MODELS["openai"],
+            "messages": openai_messages(history, prompt, image_path),
+            "max_tokens": MAX_TOKENS,
+            "stream": stream
         }
 
-        if image_path:
-            with open(image_path, "rb") as image_file:
-                img_base64 = base64.b64encode(image_file.read()).decode('utf-8')
-
-            image_content = {
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{img_base64}"
-                }
-            }
-            data["messages"][0]["content"].append(image_content)
-
-
-        text_content = {
-            "type": "text",
-            "text": prompt
-        }
-
-        data["messages"][0]["content"].append(text_content)
-
-
-        proxies = {}
-        if config.proxy:
-            proxies = {"http": config.proxy, "https": config.proxy}
-
         try:
-            response = requests.post(f"{config.openai_api_base}/chat/completions", headers=headers, json=data, proxies=proxies)
+            response = post_with_retry("openai", f"{config.openai_api_base}/chat/completions", self.cancelled,
+                                       headers=headers, json=data, stream=stream)
             response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
+            if stream:
+                return self.read_event_stream(response)
             return response.json()['choices'][0]['message']['content']
         except requests.exceptions.RequestException as e:
             raise Exception(f"OpenAI API 请求失败: {e}")
 
 
-    def call_deepseek_api(self, prompt, image_path=None):
+    def call_deepseek_api(self, prompt, image_path=None, stream=False, history=None):
         #  Deepseek API 的调用逻辑，需要根据 Deepseek 的 API 文档来实现
-        api_url = "YOUR_DEEPSEEK_API_ENDPOINT"  # 替换为实际的 Deepseek API 端点
+        api_url = config.deepseek_api_url  # 在设置中配置实际的 Deepseek API 端点
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {config.deepseek_api_key}"
         }
 
         data = {
-            "model": "deepseek-vl",
-            "messages": [
-                {
-                    "role": "user",
-                    "content": []
-                }
-            ],
-            "max_tokens": 300
+            "model": PROVIDER_MODELS["deepseek-r1"],
+            "messages": openai_messages(history, prompt, image_path),
+            "max_tokens": MAX_TOKENS,
+            "stream": stream
         }
 
-        if image_path:
-            with open(image_path, "rb") as image_file:
-                img_base64 = base64.b64encode(image_file.read()).decode('utf-8')
-
-            image_content = {
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{img_base64}"
-                }
-            }
-            data["messages"][0]["content"].append(image_content)
-
-        text_content = {
-            "type": "text",
-            "text": prompt
-        }
-
-        data["messages"][0]["content"].append(text_content)
-
-
-        proxies = {}
-        if config.proxy:
-            proxies = {"http": config.proxy, "https": config.proxy}
-
-
         try:
-            response = requests.post(api_url, headers=headers, json=data, proxies=proxies)
+            response = post_with_retry("deepseek-r1", api_url, self.cancelled, headers=headers, json=data,
+                                       stream=stream)
             response.raise_for_status()
+            if stream:
+                return self.read_event_stream(response)
             return response.json()['choices'][0]['message']['content'] # 根据实际的返回格式调整
         except requests.exceptions.RequestException as e:
             raise Exception(f"Deepseek API 请求失败: {e}")
 
-    def call_gemini_api(self, prompt, image_path=None):
+    def call_gemini_api(self, prompt, image_path=None, history=None):
         # Gemini API 的调用逻辑，需要根据 Gemini 的 API 文档来实现
-         api_url = "https://7b5krb21xg.apifox.cn"  # 替换为实际的 Gemini API 端点
+         api_url = config.gemini_api_url  # 在设置中配置实际的 Gemini API 端点
          headers = {
             "Content-Type": "application/json",
             "Content-Type": "application/json",
@@ -236,41 +967,268 @@ class ApiCallThread(QThread):
         }
 
          data = {
-            "contents": [{
-                "parts": []
-            }]
+            "contents": gemini_contents(history, prompt, image_path)
          }
 
-         if image_path:
-             with open(image_path, "rb") as image_file:
-                 img_base64 = base64.b64encode(image_file.read()).decode('utf-8')
-
-             image_content = {
-                 "inline_data": {
-                     "mime_type": "image/jpeg",
-                     "data": img_base64
-                 }
-             }
-             data["contents"][0]["parts"].append(image_content)
-
-
-         text_content = {
-             "text": prompt
-         }
-         data["contents"][0]["parts"].append(text_content)
-
-         proxies = {}
-         if config.proxy:
-             proxies = {"http": config.proxy, "https": config.proxy}
-
          try:
-            response = requests.post(api_url, headers=headers, json=data, params=params, proxies=proxies)
+            response = post_with_retry("gemini-2.0", api_url, self.cancelled, headers=headers, json=data,
+                                       params=params)
             response.raise_for_status()
             return response.json()['candidates'][0]['content']['parts'][0]['text']  # 根据实际的返回格式调整
          except requests.exceptions.RequestException as e:
              raise Exception(f"Gemini API 请求失败: {e}")
 
 
+class FanoutApiThread(ApiCallThread):
+    """
+    把同一提示词并发发送给多个提供商：first 模式返回最先成功的回复，all 模式并排显示全部回复。
+    每个子请求先查回复缓存，未命中时占用调度器中该提供商的名额，与单个请求共用同一并发上限。
+    """
+    fanout_finished = pyqtSignal(list)  # all 模式的结果列表，每项为 (提供商, 耗时, 回复, 错误)
+    first_received = pyqtSignal(str, float, str)  # first 模式最先成功的回复：提供商、耗时、回复原文
+
+    def __init__(self, prompt, image_path=None, use_cache=False, histories=None, scheduler=None):
+        super().__init__(prompt, image_path, use_cache)
+        self.histories = histories or {}  # 按各提供商的预算分别压缩的历史轮次，key 为提供商
+        self.scheduler = scheduler  # RequestScheduler，为 None 时子请求不受并发上限限制
+
+    def history_for(self, provider):
+        return self.histories.get(provider, [])
+
+    def run(self):
+        providers = [provider for provider in config.fanout_providers if provider in PROVIDER_MODELS]
+        if not providers:
+            self.error_occurred.emit("没有可用的并发提供商")
+            return
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(len(providers), config.fanout_max_workers)))
+        futures = {executor.submit(self.timed_call, provider): provider for provider in providers}
+        results = []
+        try:
+            for future in as_completed(futures):
+                provider = futures[future]
+                try:
+                    response, elapsed = future.result()
+                except Exception as e:
+                    results.append((provider, None, None, str(e)))
+                    continue
+                if config.fanout_mode == "first":
+                    self.first_received.emit(provider, elapsed, response)
+                    return
+                results.append((provider, elapsed, response, None))
+        finally:
+            # 取消尚未开始的请求；进行中的流式请求在读取下一行时断开，其余请求不再重试，结果丢弃
+            self.cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if config.fanout_mode == "first":
+            self.error_occurred.emit("所有提供商均调用失败: " + "; ".join(f"{p}: {e}" for p, _, _, e in results))
+        else:
+            results.sort(key=lambda item: providers.index(item[0]))
+            self.fanout_finished.emit(results)
+
+    def timed_call(self, provider):
+        if self.cancelled.is_set():
+            raise RuntimeError("已取消")
+        start = time.perf_counter()
+        cache_key = self.response_cache_key(provider) if self.use_cache else None
+        cached = response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            return cached, time.perf_counter() - start
+        if self.scheduler is not None and not self.scheduler.acquire(provider, self.cancelled):
+            raise RuntimeError("已取消")
+        try:
+            # 支持流式输出的提供商按流式请求，取消时可以随时断开；增量文本不显示，只取完整回复
+            stream = config.stream and provider in ("openai", "deepseek-r1")
+            response = self.call_provider(provider, self.prompt, self.image_path, stream)
+        finally:
+            if self.scheduler is not None:
+                self.scheduler.release(provider)
+        if cache_key:
+            response_cache.put(cache_key, response)
+        return response, time.perf_counter() - start
+
+
+# -------------------- 请求调度 --------------------
+class RequestScheduler(QObject):
+    """
+    请求队列：限制每个提供商同时进行的请求数，超出的请求排队等待。
+    并发请求的线程本身不占名额，它的各个子请求在工作线程中通过 acquire()/release() 占用同一批名额。
+    """
+    queue_changed = pyqtSignal(list)  # 队列内容，每项为显示文本
+    slot_released = pyqtSignal()  # 子请求在工作线程中释放了名额，转到界面线程重新调度
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pending = []  # 等待中的请求，每项为 (提供商, 线程, 描述, 是否占用名额)
+        self.running = []  # 进行中的请求，每项为 (提供商, 线程, 描述, 是否占用名额)
+        self.active = {}  # 各提供商已占用的名额数，包括并发请求的子请求
+        self._condition = threading.Condition()
+        self.slot_released.connect(self._dispatch)
+
+    def submit(self, provider, thread, description, use_slot=True):
+        thread.finished.connect(lambda: self._on_finished(thread))
+        self.pending.append((provider, thread, description, use_slot))
+        self._dispatch()
+
+    def acquire(self, provider, cancelled):
+        """在工作线程中等待并占用一个名额；cancelled 设置后放弃等待并返回 False"""
+        with self._condition:
+            while self.active.get(provider, 0) >= config.max_concurrent_requests:
+                if cancelled.is_set():
+                    return False
+                self._condition.wait(0.1)
+            self.active[provider] = self.active.get(provider, 0) + 1
+            return True
+
+    def release(self, provider):
+        with self._condition:
+            self.active[provider] -= 1
+            self._condition.notify_all()
+        self.slot_released.emit()
+
+    def _try_acquire(self, provider):
+        with self._condition:
+            if self.active.get(provider, 0) >= config.max_concurrent_requests:
+                return False
+            self.active[provider] = self.active.get(provider, 0) + 1
+            return True
+
+    def _dispatch(self):
+        for item in list(self.pending):
+            if not item[3] or self._try_acquire(item[0]):
+                self.pending.remove(item)
+                self.running.append(item)
+                item[1].start()
+        self._notify()
+
+    def _on_finished(self, thread):
+        finished = [item for item in self.running if item[1] is thread]
+        self.running = [item for item in self.running if item[1] is not thread]
+        for provider, _, _, use_slot in finished:
+            if use_slot:
+                self.release(provider)
+        self._dispatch()
+
+    def _notify(self):
+        self.queue_changed.emit([f"[发送中] {item[0]}: {item[2]}" for item in self.running]
+                                + [f"[排队中] {item[0]}: {item[2]}" for item in self.pending])
+
+
+# -------------------- 批量模式 --------------------
+def read_batch_prompts(filename):
+    """逐行读取批量输入 (JSON Lines)，每行为 {"id": 可选编号, "prompt": 提示词, "image": 可选图片路径}"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get("prompt"):
+                raise ValueError(f"第 {line_number} 行缺少 prompt")
+            yield str(item.get("id", line_number)), item["prompt"], item.get("image")
+
+
+def completed_batch_ids(filename):
+    """读取已有的输出文件，返回已成功完成的编号，用于中断后续跑"""
+    done = set()
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 中断时写了一半的行
+                if record.get("error") is None:
+                    done.add(str(record.get("id")))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def run_batch_item(provider, item_id, prompt, image_path):
+    """在工作线程中同步调用一次 API，返回输出记录"""
+    started = time.time()
+    start = time.perf_counter()
+    record = {"id": item_id, "provider": provider, "started": started}
+    try:
+        cache_key = None
+        response = None
+        if config.response_cache_enabled:
+            cache_key = response_cache.make_key(provider, prompt, image_path)
+            response = response_cache.get(cache_key) if cache_key else None
+        record["cached"] = response is not None
+        if response is None:
+            # 复用 ApiCallThread 的请求逻辑，只调用方法，不启动线程
+            response = ApiCallThread(prompt, image_path).call_provider(provider, prompt, image_path)
+            if cache_key:
+                response_cache.put(cache_key, response)
+        record["response"] = response
+        record["error"] = None
+    except Exception as e:
+        record["response"] = None
+        record["error"] = str(e)
+    record["elapsed"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def run_batch(input_file, output_file, provider=None, workers=None):
+    """
+    无界面批量发送提示词：并发数受限，完成一条写出一条，已成功的编号在重跑时跳过。
+
+    Returns:
+        int: 失败条数。
+    """
+    provider = provider or config.api_provider
+    if provider not in PROVIDER_MODELS:
+        raise ValueError(f"不支持的API提供商: {provider}")
+    workers = max(1, workers or config.max_concurrent_requests)
+    done = completed_batch_ids(output_file)
+    succeeded = failed = skipped = 0
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    with open(output_file, 'a', encoding='utf-8') as output:
+        running = set()
+
+        def collect(finished):
+            nonlocal succeeded, failed
+            for future in finished:
+                record = future.result()
+                running.discard(future)  # 中断时不会重复写出
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()  # 每条结果立即落盘，中断后可续跑
+                if record["error"] is None:
+                    succeeded += 1
+                else:
+                    failed += 1
+                    print(f"[失败] {record['id']}: {record['error']}", file=sys.stderr)
+            print(f"已完成 {succeeded + failed}，成功 {succeeded}，失败 {failed}，跳过 {skipped}", file=sys.stderr)
+
+        try:
+            for item_id, prompt, image_path in read_batch_prompts(input_file):
+                if item_id in done:
+                    skipped += 1
+                    continue
+                # 正在进行的请求数达到上限时先等待，避免一次读入整个输入文件
+                if len(running) >= workers * 2:
+                    finished, running = wait(running, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                running.add(executor.submit(run_batch_item, provider, item_id, prompt, image_path))
+            collect(as_completed(running))
+        except ValueError:
+            # 输入文件中途出错时，先写出已提交请求的结果再报告错误，修正输入后续跑不必重发
+            collect(as_completed(running))
+            executor.shutdown()
+            raise
+        except KeyboardInterrupt:
+            # 已完成但尚未写出的请求已经计费，先写出结果，续跑时不再重发；未开始的请求取消，进行中的不再等待
+            collect([future for future in running if future.done() and not future.cancelled()])
+            executor.shutdown(wait=False, cancel_futures=True)
+            print("已中断，重新运行同一命令即可继续", file=sys.stderr)
+            raise
+    executor.shutdown()
+    return failed
+
+
 # -------------------- 主窗口 --------------------
 class ChatWindow(QWidget):
     def __init__(self):
@@ -286,19 +1244,38 @@ class ChatWindow(QWidget):
         self.image_label = QLabel()  # 用于显示上传的图片
         self.image_label.setAlignment(Qt.AlignCenter)
         self.image_path = None
+        self.preview_threads = set()  # 正在读取图片预览的线程，结束前保留引用
+        self.stream_cursors = {}  # 正在流式显示的回复，key 为 API 线程，value 为 (回复开头的光标, 回复末尾的光标)
+        self.conversation = Conversation()  # 多轮对话上下文
+        self.exchanges = {}  # 进行中的请求在对话上下文中预留的一问一答，key 为 API 线程
+        self.transcript = TranscriptStore()  # 持久化的聊天记录
+        self.loaded_count = 0  # 聊天窗口中的消息条数
+        self.first_loaded_id = None  # 窗口中最早一条已存储消息的编号
+        self.history_exhausted = False  # 更早的记录是否已全部加载
+
+        self.queue_list = QListWidget()  # 待处理的请求
+        self.queue_list.setMaximumHeight(80)
+        self.queue_list.hide()
+        self.scheduler = RequestScheduler(self)
+        self.scheduler.queue_changed.connect(self.update_queue)
 
         self.upload_button = QPushButton("上传图片")
         self.send_button = QPushButton("发送")
         self.settings_button = QPushButton("设置")
+        self.new_chat_button = QPushButton("新对话")
+        self.search_button = QPushButton("搜索记录")
 
         # 布局
         hbox = QHBoxLayout()
         hbox.addWidget(self.upload_button)
         hbox.addWidget(self.send_button)
+        hbox.addWidget(self.new_chat_button)
+        hbox.addWidget(self.search_button)
         hbox.addWidget(self.settings_button)
 
         vbox = QVBoxLayout()
         vbox.addWidget(self.chat_display)
+        vbox.addWidget(self.queue_list)  # 请求队列
         vbox.addWidget(self.image_label) # 添加图片显示
         vbox.addWidget(self.input_box)
         vbox.addLayout(hbox)
@@ -309,15 +1286,32 @@ class ChatWindow(QWidget):
         self.send_button.clicked.connect(self.send_message)
         self.upload_button.clicked.connect(self.upload_image)
         self.settings_button.clicked.connect(self.open_settings)
+        self.new_chat_button.clicked.connect(self.new_conversation)
+        self.search_button.clicked.connect(self.open_search)
+        # 滚动到顶部时加载更早的记录
+        self.chat_display.verticalScrollBar().valueChanged.connect(self.on_scroll)
+
+        self.load_recent()
+
+        # 提前与当前提供商建立长连接 (默认关闭，开启后每次启动都会发送一个不带认证的 HEAD 请求)
+        if config.prewarm_connections and config.api_provider == "openai":
+            session_pool.prewarm("openai", config.openai_api_base)
 
     def display_image(self, image_path):
-        """显示图片在 QLabel 中"""
-        pixmap = QPixmap(image_path)
+        """显示图片在 QLabel 中，读取和缩放在后台线程中进行"""
+        self.image_path = image_path # 保存图片路径
         # 缩放图片以适应 QLabel 的大小
-        scaled_pixmap = pixmap.scaled(self.image_label.width(), self.image_label.height(), Qt.KeepAspectRatio)
-        self.image_label.setPixmap(scaled_pixmap)
+        thread = ImagePreviewThread(image_path, self.image_label.width(), self.image_label.height())
+        thread.loaded.connect(self.show_preview)
+        thread.finished.connect(lambda: self.preview_threads.discard(thread))
+        self.preview_threads.add(thread)
+        thread.start()
+
+    def show_preview(self, image_path, image):
+        if image_path != self.image_path:
+            return  # 读取期间又选择了别的图片
+        self.image_label.setPixmap(QPixmap.fromImage(image))
         self.image_label.adjustSize() # 根据图片大小调整Label
-        self.image_path = image_path # 保存图片路径
 
     def upload_image(self):
         file_dialog = QFileDialog()
@@ -325,24 +1319,238 @@ class ChatWindow(QWidget):
         if file_path:
             self.display_image(file_path)  # 显示图片
 
+    def load_recent(self):
+        """启动时只加载最近一页聊天记录"""
+        rows = self.transcript.page(limit=config.transcript_page_size)
+        for entry_id, role, content, _ in rows:
+            self.append_entry(entry_id, f"{ROLE_PREFIXES.get(role, role)}: {content}")
+        self.history_exhausted = len(rows) < config.transcript_page_size
+        if rows:
+            self.chat_display.append("---------- 以上为历史记录 ----------")
+        scroll_bar = self.chat_display.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
+
+    def on_scroll(self, value):
+        scroll_bar = self.chat_display.verticalScrollBar()
+        if value == scroll_bar.minimum() and scroll_bar.maximum() > scroll_bar.minimum():
+            self.load_older()
+
+    def load_older(self):
+        """从记录库读取更早的一页，插入到窗口开头并保持当前的阅读位置"""
+        if self.history_exhausted or self.first_loaded_id is None:
+            return
+        rows = self.transcript.page(self.first_loaded_id, config.transcript_page_size)
+        self.history_exhausted = len(rows) < config.transcript_page_size
+        if not rows:
+            return
+        document = self.chat_display.document()
+        scroll_bar = self.chat_display.verticalScrollBar()
+        old_maximum, old_value = scroll_bar.maximum(), scroll_bar.value()
+        first_state = document.firstBlock().userState()
+        cursor = QTextCursor(document)
+        for entry_id, role, content, _ in rows:
+            start = cursor.position()
+            cursor.insertText(f"{ROLE_PREFIXES.get(role, role)}: {content}")
+            cursor.insertBlock()
+            self.mark_entry(document.findBlock(start), cursor.block().previous(), entry_id)
+        cursor.block().setUserState(first_state)  # 原来的第一段在插入后保持原有标记
+        self.loaded_count += len(rows)
+        self.first_loaded_id = rows[0][0]
+        scroll_bar.setValue(old_value + scroll_bar.maximum() - old_maximum)
+
+    @staticmethod
+    def mark_entry(first_block, last_block, entry_id):
+        """在消息的第一段记录消息编号 (流式输出中的回复为 0)，其余段落记为 -1，用于分页和裁剪"""
+        block = first_block
+        block.setUserState(entry_id)
+        while block != last_block and block.isValid():
+            block = block.next()
+            block.setUserState(-1)
+
+    def append_entry(self, entry_id, *parts):
+        """在窗口末尾追加一条消息，窗口中的消息过多时移除最早的消息"""
+        document = self.chat_display.document()
+        first_number = 0 if document.isEmpty() else document.blockCount()
+        for part in parts:
+            self.chat_display.append(part)
+        self.mark_entry(document.findBlockByNumber(first_number), document.lastBlock(), entry_id)
+        self.loaded_count += 1
+        if self.first_loaded_id is None and entry_id > 0:
+            self.first_loaded_id = entry_id
+        self.trim_display()
+
+    def record(self, role, content, *parts):
+        """保存一条消息并显示，parts 为空时按角色前缀显示内容"""
+        entry_id = self.transcript.append(role, content)
+        self.append_entry(entry_id, *(parts or (f"{ROLE_PREFIXES[role]}: {content}",)))
+
+    def trim_display(self):
+        """
+        窗口中的消息超过上限时移除最早的消息，被移除的记录可以滚动到顶部重新加载。
+        正在流式输出的回复及其之后的消息不移除，否则回复开头的光标会落到别的段落上。
+        """
+        excess = self.loaded_count - config.transcript_max_loaded
+        if excess <= 0:
+            return
+        streaming = {start.block().position() for start, _ in self.stream_cursors.values()}
+        document = self.chat_display.document()
+        block = document.firstBlock()
+        starts = 0
+        while block.isValid():
+            if block.userState() >= 0:
+                if starts == excess or block.position() in streaming:
+                    break
+                starts += 1
+            block = block.next()
+        if not block.isValid() or starts == 0:
+            return
+        first_state = block.userState()
+        first_id = None
+        next_block = block
+        while next_block.isValid() and first_id is None:
+            if next_block.userState() > 0:
+                first_id = next_block.userState()
+            next_block = next_block.next()
+        cursor = QTextCursor(document)
+        cursor.setPosition(block.position(), QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        document.firstBlock().setUserState(first_state)
+        self.loaded_count -= starts
+        self.first_loaded_id = first_id
+        self.history_exhausted = False
+
     def send_message(self):
         prompt = self.input_box.toPlainText()
-        self.chat_display.append(f"用户: {prompt}")
+        self.record("user", prompt)
         self.input_box.clear()
-
-        # 创建 API 调用线程
-        self.api_thread = ApiCallThread(prompt, self.image_path)  # 传递图片路径
-        self.api_thread.message_received.connect(self.display_message)
-        self.api_thread.error_occurred.connect(self.display_error)
-        self.api_thread.start()
-
-
-    def display_message(self, message):
-        self.chat_display.append(f"AI: {message}")
+        # 图片只随本条提问发送一次，之后由对话历史携带，不再附加到后续提问
+        image_path = self.image_path
+        self.image_path = None
+        self.image_label.clear()
+
+        # 历史在记录本条提问之前取出，按目标提供商的预算压缩；本条提问和回复的位置在发送时预留
+        if config.fanout_mode in ("first", "all"):
+            # 多提供商并发请求，每个提供商按自己的预算取历史
+            histories = {provider: self.conversation.history(provider) for provider in config.fanout_providers}
+            exchange = self.conversation.begin(prompt, image_path)
+            api_thread = FanoutApiThread(prompt, image_path, config.response_cache_enabled, histories,
+                                         self.scheduler)
+            api_thread.first_received.connect(self.display_first)
+            api_thread.error_occurred.connect(self.display_error)
+            api_thread.fanout_finished.connect(self.display_fanout)
+            self.exchanges[api_thread] = exchange
+            self.scheduler.submit("fanout", api_thread, prompt[:30], use_slot=False)
+            return
+
+        history = self.conversation.history(config.api_provider)
+        exchange = self.conversation.begin(prompt, image_path)
+        # 创建 API 调用线程，相同请求命中回复缓存时由线程直接返回缓存的回复
+        api_thread = ApiCallThread(prompt, image_path, config.response_cache_enabled, history)  # 传递图片路径和历史
+        api_thread.message_received.connect(self.display_message)
+        api_thread.error_occurred.connect(self.display_error)
+        api_thread.chunk_received.connect(self.display_chunk)
+        api_thread.stream_finished.connect(self.finish_stream)
+        self.exchanges[api_thread] = exchange
+        self.scheduler.submit(config.api_provider, api_thread, prompt[:30])  # 交给调度器排队发送
+
+
+    def complete_exchange(self, thread, text):
+        """把回复原文填入该请求预留的位置"""
+        exchange = self.exchanges.pop(thread, None)
+        if exchange is not None:
+            self.conversation.complete(exchange, text)
+
+    def display_message(self, message, cached=False):
+        prefix = "AI (缓存)" if cached else "AI"
+        self.record("assistant", message, f"{prefix}: {message}")
+        self.complete_exchange(self.sender(), message)
+
+    def display_first(self, provider, elapsed, response):
+        """first 模式：显示时标注提供商和耗时，对话历史只保存回复原文"""
+        self.record("assistant", response, f"AI: [{provider} {elapsed:.2f}s] {response}")
+        self.complete_exchange(self.sender(), response)
+
+    def display_fanout(self, results):
+        """把多个提供商的回复并排显示，表头为提供商和耗时"""
+        headers = []
+        cells = []
+        lines = []  # 存入聊天记录的纯文本
+        answer = None
+        for provider, elapsed, response, error in results:
+            if error is None:
+                headers.append(f"{html.escape(provider)} ({elapsed:.2f}s)")
+                cells.append(html.escape(response).replace("\n", "<br>"))
+                lines.append(f"[{provider} {elapsed:.2f}s] {response}")
+                if answer is None:
+                    answer = response  # 第一个成功的回复计入对话历史
+            else:
+                headers.append(f"{html.escape(provider)} (失败)")
+                cells.append(f"<span style='color: red;'>{html.escape(error)}</span>")
+                lines.append(f"[{provider} 失败] {error}")
+        table = ("<table border='1' style='border-collapse: collapse;' width='100%'><tr>"
+                 + "".join(f"<th style='padding: 4px;'>{header}</th>" for header in headers)
+                 + "</tr><tr>"
+                 + "".join(f"<td style='padding: 4px; vertical-align: top;'>{cell}</td>" for cell in cells)
+                 + "</tr></table>")
+        self.record("assistant", "\n".join(lines), "AI:", table)
+        if answer is not None:
+            self.complete_exchange(self.sender(), answer)
+        else:
+            self.discard_exchange(self.sender())
+
+    def display_chunk(self, text):
+        """把流式回复的增量文本追加到对应回复的末尾，多个回复同时输出时互不干扰"""
+        thread = self.sender()
+        start, cursor = self.stream_cursors.get(thread, (None, None))
+        if cursor is None:
+            self.append_entry(0, "AI: ")  # 回复结束后才写入记录库并取得编号
+            document = self.chat_display.document()
+            start = QTextCursor(document.lastBlock())
+            cursor = QTextCursor(document)
+            cursor.movePosition(QTextCursor.End)
+            self.stream_cursors[thread] = (start, cursor)
+        # 其他消息追加到末尾时光标保持原位，只有本回复的文本会推动光标
+        cursor.setKeepPositionOnInsert(False)
+        cursor.insertText(text)
+        cursor.setKeepPositionOnInsert(True)
+        scroll_bar = self.chat_display.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
+
+    def finish_stream(self, message):
+        cursors = self.stream_cursors.pop(self.sender(), None)
+        if cursors is None:
+            self.display_message(message)  # 回复为空或没有增量时直接显示
+        else:
+            entry_id = self.transcript.append("assistant", message)
+            cursors[0].block().setUserState(entry_id)
+            if self.first_loaded_id is None:
+                self.first_loaded_id = entry_id
+            self.complete_exchange(self.sender(), message)
+
+    def update_queue(self, items):
+        self.queue_list.clear()
+        self.queue_list.addItems(items)
+        self.queue_list.setVisible(bool(items))
+
+    def discard_exchange(self, thread):
+        """请求失败，撤回该请求的提问"""
+        exchange = self.exchanges.pop(thread, None)
+        if exchange is not None:
+            self.conversation.discard(exchange)
 
     def display_error(self, error):
+        self.stream_cursors.pop(self.sender(), None)
+        self.discard_exchange(self.sender())
         QMessageBox.critical(self, "错误", error)
-        self.chat_display.append(f"错误: {error}")
+        self.record("error", error)
+
+    def new_conversation(self):
+        """清空对话历史，后续提问不再携带之前的上下文"""
+        self.conversation.clear()
+        self.chat_display.append("---------- 新对话 ----------")
+
+    def open_search(self):
+        TranscriptSearchDialog(self.transcript, self).exec_()
 
     def open_settings(self):
         settings_dialog = SettingsDialog(self)
@@ -354,8 +1562,33 @@ class ChatWindow(QWidget):
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="AI 聊天")
+    parser.add_argument("--batch", metavar="输入文件", help="无界面批量模式：从 JSON Lines 文件读取提示词")
+    parser.add_argument("--output", metavar="输出文件", help="批量模式的结果文件 (JSON Lines)，已完成的条目在重跑时跳过")
+    parser.add_argument("--provider", choices=list(PROVIDER_MODELS), help="批量模式使用的API提供商，默认使用配置")
+    parser.add_argument("--workers", type=int, help="批量模式的并发请求数，默认使用 max_concurrent_requests")
+    args, qt_args = parser.parse_known_args()
+
+    if args.batch:
+        if not args.output:
+            parser.error("批量模式需要指定 --output")
+        app = QCoreApplication(sys.argv[:1] + qt_args)  # 图片编解码插件需要应用实例
+        try:
+            exit_code = 1 if run_batch(args.batch, args.output, args.provider, args.workers) else 0
+        except (OSError, ValueError) as e:
+            print(f"批量处理失败: {e}", file=sys.stderr)
+            exit_code = 1
+        except KeyboardInterrupt:
+            exit_code = 130
+        finally:
+            session_pool.close()
+        sys.exit(exit_code)
+
+    app = QApplication(sys.argv[:1] + qt_args)
     chat_window = ChatWindow()
     chat_window.resize(800, 600) # 初始窗口大小
     chat_window.show()
-    sys.exit(app.exec_())
+    exit_code = app.exec_()
+    chat_window.transcript.close()
+    session_pool.close()
+    sys.exit(exit_code)
@@ -1,252 +1,460 @@
-import random
+import argparse
+import sqlite3
+import threading
 import tkinter as tk
-import pickle
-from tkinter import messagebox, Scrollbar, Listbox
-from datetime import datetime
-import os
-
-# 获取当前电脑用户名
-username = os.getlogin()
-
-# 判断 OPMAK 文件夹是否存在，不存在则创建
-opmak_folder = os.path.join(f'C:/Users/{username}/OPMAK')
-if not os.path.exists(opmak_folder):
-    os.makedirs(opmak_folder)
-
-# 生成随机密码的函数
-def generate_password():
-    chars = ''
-    if include_lowercase.get():
-        chars += 'abcdefghijklmnopqrstuvwxyz'
-    if include_uppercase.get():
-        chars += 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
-    if include_digits.get():
-        chars += '0123456789'
-    if include_special_symbols.get():
-        spec_symbols = special_symbols_entry.get().replace(':', '')
-        chars += spec_symbols
-
-    excluded = excluded_chars_entry.get()
-    if excluded:
-        chars = [char for char in chars if char not in excluded]
-
-    length_str = length_entry.get()
-    if not length_str.isdigit():
-        result_text.delete(1.0, tk.END)
-        result_text.insert(tk.END, "请填写数字作为密码长度。")
-        return
-    length = int(length_str)
-
-    quantity_str = quantity_entry.get()
-    if not quantity_str.isdigit():
-        result_text.delete(1.0, tk.END)
-        result_text.insert(tk.END, "请填写数字作为密码数量。")
-        return
-    quantity = int(quantity_str)
-
-    passwords = [''.join(random.choice(chars) for _ in range(length)) for _ in range(quantity)]
-    result_text.delete(1.0, tk.END)
-    for password in passwords:
-        result_text.insert(tk.END, password + '\n')
-
-    if enable_history.get():
-        now = datetime.now()
-        with open(os.path.join(opmak_folder, 'password_history.dat'), 'a') as file:
-            for password in passwords:
-                file.write(f'{now.strftime("%Y-%m-%d %H:%M:%S")}: {password}\n')
-        clear_history_if_needed()
-
-# 保存设置的函数
-def save_settings():
-    settings = {}
-    settings['include_lowercase'] = include_lowercase.get()
-    settings['include_uppercase'] = include_uppercase.get()
-    settings['include_digits'] = include_digits.get()
-    settings['include_special_symbols'] = include_special_symbols.get()
-    settings['special_symbols'] = special_symbols_entry.get()
-    settings['excluded_chars'] = excluded_chars_entry.get()
-    settings['length'] = length_entry.get()
-    settings['quantity'] = quantity_entry.get()
-    settings['enable_history'] = enable_history.get()
-
-    with open(os.path.join(opmak_folder, 'config.dat'), 'wb') as file:
-        pickle.dump(settings, file)
-
-# 加载设置的函数
-def load_settings():
-    try:
-        with open(os.path.join(opmak_folder, 'config.dat'), 'rb') as file:
-            settings = pickle.load(file)
-            include_lowercase.set(settings.get('include_lowercase', False))
-            include_uppercase.set(settings.get('include_uppercase', False))
-            include_digits.set(settings.get('include_digits', False))
-            include_special_symbols.set(settings.get('include_special_symbols', False))
-            special_symbols_entry.delete(0, tk.END)
-            special_symbols_entry.insert(0, settings.get('special_symbols', ''))
-            excluded_chars_entry.delete(0, tk.END)
-            excluded_chars_entry.insert(0, settings.get('excluded_chars', ''))
-            length_entry.delete(0, tk.END)
-            length_entry.insert(0, settings.get('length', ''))
-            quantity_entry.delete(0, tk.END)
-            quantity_entry.insert(0, settings.get('quantity', ''))
-            enable_history.set(settings.get('enable_history', False))
-    except FileNotFoundError:
-        pass
-
-# 复制生成的密码到剪贴板的函数
-def copy_result_passwords():
-    password_text = result_text.get("1.0", "end-1c")
-    password_text = password_text.rstrip('\n')
-    root.clipboard_clear()
-    root.clipboard_append(password_text)
-
-# 显示密码历史记录的函数
-def show_history():
-    global history_window
-    if history_window is None or not history_window.winfo_exists():
-        history_window = tk.Toplevel(root)
-        history_window.title("密码历史记录")
-
-        main_frame = tk.Frame(history_window)
-        main_frame.pack(fill=tk.BOTH, expand=True)
-
-        listbox_frame = tk.Frame(main_frame)
-        listbox_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        with open(os.path.join(opmak_folder, 'password_history.dat'), 'r') as file:
-            lines = file.readlines()
-            sorted_lines = sorted(lines, key=lambda x: datetime.strptime(x.split(': ')[0].strip() if ':' in x else '1970-01-01 00:00:00', '%Y-%m-%d %H:%M:%S'), reverse=True)
+from tkinter import messagebox, filedialog, Scrollbar, Listbox
+
+from passgen import (DEFAULT_HISTORY_LIMIT, HISTORY_PAGE_SIZE, HistoryStore, PasswordGenerator, PasswordPolicy,
+                     build_classes, default_data_dir, load_settings, save_settings, write_passwords)
+
+GENERATE_BATCH_SIZE = 10000  # 后台生成时每批的密码数，用于显示进度
+RENDER_CHUNK_SIZE = 2000  # 每次插入结果区的密码数，合并为一次 insert
+RENDER_LIMIT = 20000  # 结果区最多显示的密码数，其余只能复制或保存
+
+
+# 随机密码生成器界面，生成、历史记录和设置的逻辑都在 passgen 模块中
+class PasswordGeneratorApp:
+    def __init__(self, root, data_dir):
+        self.root = root
+        self.data_dir = data_dir
+        self.history = HistoryStore(data_dir)
+        self.history_window = None
+        self.passwords = []  # 最近一次生成的全部密码，复制和保存时使用
+        self.render_job = None
+
+        root.title("随机密码生成器 - by 章鱼")
+
+        root.resizable(False, False)
+        root.geometry("500x600")
+
+        left_frame = tk.Frame(root)
+        left_frame.pack(side="left", padx=10)
+
+        right_frame = tk.Frame(root)
+        right_frame.pack(side="right", padx=10)
+
+        tk.Label(left_frame, text="所用字符").pack()
+        self.include_lowercase = tk.BooleanVar()
+        tk.Checkbutton(left_frame, text="小写字母(a-z)", variable=self.include_lowercase).pack()
+        self.include_uppercase = tk.BooleanVar()
+        tk.Checkbutton(left_frame, text="大写字母(A-Z)", variable=self.include_uppercase).pack()
+        self.include_digits = tk.BooleanVar()
+        tk.Checkbutton(left_frame, text="数字(0-9)", variable=self.include_digits).pack()
+        self.include_special_symbols = tk.BooleanVar()
+        tk.Label(left_frame, text="特殊符号：").pack()
+        self.special_symbols_entry = tk.Entry(left_frame)
+        self.special_symbols_entry.pack()
+        tk.Checkbutton(left_frame, text="自定义特殊符号", variable=self.include_special_symbols).pack()
+
+        tk.Label(left_frame, text="排除字符：").pack()
+        self.excluded_chars_entry = tk.Entry(left_frame)
+        self.excluded_chars_entry.pack()
+
+        tk.Label(left_frame, text="密码长度：").pack()
+        self.length_entry = tk.Entry(left_frame)
+        self.length_entry.pack()
+        tk.Label(left_frame, text="密码数量：").pack()
+        self.quantity_entry = tk.Entry(left_frame)
+        self.quantity_entry.pack()
+
+        self.enable_history = tk.BooleanVar()
+        tk.Checkbutton(left_frame, text="记录历史记录", variable=self.enable_history).pack()
+        tk.Label(left_frame, text="历史记录上限：").pack()
+        self.history_limit_entry = tk.Entry(left_frame)
+        self.history_limit_entry.insert(0, str(DEFAULT_HISTORY_LIMIT))
+        self.history_limit_entry.pack()
+
+        self.render_results = tk.BooleanVar(value=True)
+        tk.Checkbutton(left_frame, text="在结果区显示", variable=self.render_results).pack()
+        self.generate_button = tk.Button(left_frame, text="生成密码", command=self.generate_password)
+        self.generate_button.pack()
+        tk.Button(left_frame, text="保存设置", command=self.save_settings).pack()
+
+        self.result_text = tk.Text(right_frame, height=10, width=50)
+        self.result_text.pack()
+        tk.Button(right_frame, text="查看历史记录", command=self.show_history).pack()
+
+        copy_result_button = tk.Button(right_frame, text="复制生成的密码", command=self.copy_result_passwords)
+        copy_result_button.pack()
+        tk.Button(right_frame, text="保存生成的密码", command=self.save_result_passwords).pack()
+        self.export_button = tk.Button(right_frame, text="导出到文件", command=self.export_passwords)
+        self.export_button.pack()
+        self.status_label = tk.Label(right_frame, text="")
+        self.status_label.pack()
+
+        policy_frame = tk.LabelFrame(right_frame, text="密码策略")
+        policy_frame.pack(fill=tk.X, pady=5)
+        tk.Label(policy_frame, text="每类至少：").grid(row=0, column=0, sticky="e")
+        self.min_per_class_entry = tk.Entry(policy_frame, width=8)
+        self.min_per_class_entry.insert(0, "0")
+        self.min_per_class_entry.grid(row=0, column=1, sticky="w")
+        tk.Label(policy_frame, text="最低熵(位)：").grid(row=1, column=0, sticky="e")
+        self.min_entropy_entry = tk.Entry(policy_frame, width=8)
+        self.min_entropy_entry.insert(0, "0")
+        self.min_entropy_entry.grid(row=1, column=1, sticky="w")
+        self.no_repeat = tk.BooleanVar()
+        tk.Checkbutton(policy_frame, text="字符不重复", variable=self.no_repeat).grid(row=0, column=2, sticky="w")
+        self.no_adjacent = tk.BooleanVar()
+        tk.Checkbutton(policy_frame, text="相邻字符不同", variable=self.no_adjacent).grid(row=1, column=2, sticky="w")
+        self.unique = tk.BooleanVar()
+        tk.Checkbutton(policy_frame, text="批内不重复", variable=self.unique).grid(row=2, column=0, columnspan=2,
+                                                                              sticky="w")
+        self.unique_history = tk.BooleanVar()
+        tk.Checkbutton(policy_frame, text="与历史不重复", variable=self.unique_history).grid(row=2, column=2, sticky="w")
+
+        self.load_settings()
+
+        root.after(0, self.clear_history_if_needed)
+
+    # 在结果区显示提示信息
+    def show_result_message(self, message):
+        self.cancel_render()
+        self.passwords = []
+        self.result_text.delete(1.0, tk.END)
+        self.result_text.insert(tk.END, message)
+
+    # 读取界面上的历史记录上限
+    def history_limit(self):
+        limit_str = self.history_limit_entry.get()
+        return int(limit_str) if limit_str.isdigit() else DEFAULT_HISTORY_LIMIT
+
+    # 读取界面上的字符集、长度、数量和密码策略，无效时在结果区提示并返回 None
+    def read_options(self):
+        try:
+            classes = build_classes(self.include_lowercase.get(), self.include_uppercase.get(),
+                                    self.include_digits.get(),
+                                    self.special_symbols_entry.get() if self.include_special_symbols.get() else '',
+                                    self.excluded_chars_entry.get())
+        except ValueError as e:
+            self.show_result_message(str(e))
+            return None
+
+        length_str = self.length_entry.get()
+        if not length_str.isdigit():
+            self.show_result_message("请填写数字作为密码长度。")
+            return None
+        length = int(length_str)
+
+        quantity_str = self.quantity_entry.get()
+        if not quantity_str.isdigit():
+            self.show_result_message("请填写数字作为密码数量。")
+            return None
+        quantity = int(quantity_str)
+
+        min_per_class_str = self.min_per_class_entry.get() or "0"
+        if not min_per_class_str.isdigit():
+            self.show_result_message("请填写数字作为每类至少的字符数。")
+            return None
+        try:
+            min_entropy = float(self.min_entropy_entry.get() or 0)
+        except ValueError:
+            self.show_result_message("请填写数字作为最低熵。")
+            return None
+
+        policy = PasswordPolicy(classes, length, int(min_per_class_str), self.no_repeat.get(),
+                                self.no_adjacent.get(), min_entropy)
+        try:
+            policy.validate()
+        except ValueError as e:
+            self.show_result_message(str(e))
+            return None
+        return policy, self.unique.get(), self.unique_history.get(), quantity
+
+    # 创建生成器，在后台线程中调用：与历史不重复时需要从历史记录库构建布隆过滤器
+    def create_generator(self, policy, unique, unique_history):
+        history_filter = self.history.bloom_filter() if unique_history else None
+        return PasswordGenerator(policy, unique, history_filter)
+
+    # 生成随机密码的函数：生成和写入历史记录在后台线程中进行，结果分块插入结果区
+    def generate_password(self):
+        options = self.read_options()
+        if options is None:
+            return
+        policy, unique, unique_history, quantity = options
+        record_history = self.enable_history.get()
+        history_limit = self.history_limit()
+
+        state = {'done': 0, 'passwords': None, 'error': None, 'finished': False}
+
+        def run():
+            try:
+                generator = self.create_generator(policy, unique, unique_history)
+                passwords = []
+                while len(passwords) < quantity:
+                    passwords += generator.generate(min(GENERATE_BATCH_SIZE, quantity - len(passwords)))
+                    state['done'] = len(passwords)
+                if record_history:
+                    self.history.record(passwords, history_limit)
+                state['passwords'] = passwords
+            except (OSError, ValueError, sqlite3.Error) as e:
+                state['error'] = e
+            except Exception as e:
+                # 意外错误同样要提示，并让 poll 结束等待、恢复按钮
+                state['error'] = f"生成时发生意外错误：{e!r}"
+            finally:
+                state['finished'] = True
+
+        def poll():
+            if not state['finished']:
+                self.status_label.config(text=f"已生成 {state['done']}/{quantity}")
+                self.root.after(100, poll)
+                return
+            self.generate_button.config(state=tk.NORMAL)
+            self.status_label.config(text="")
+            if state['error'] is not None:
+                self.show_result_message(str(state['error']))
+                return
+            self.show_passwords(state['passwords'])
+
+        self.show_result_message("正在生成……")
+        self.generate_button.config(state=tk.DISABLED)
+        threading.Thread(target=run, daemon=True).start()
+        poll()
+
+    # 停止尚未完成的分块显示
+    def cancel_render(self):
+        if self.render_job is not None:
+            self.root.after_cancel(self.render_job)
+            self.render_job = None
+
+    # 把密码分块插入结果区，每块之间让出事件循环；超过 RENDER_LIMIT 的部分不显示
+    def show_passwords(self, passwords):
+        self.show_result_message("")
+        self.passwords = passwords
+        shown = min(len(passwords), RENDER_LIMIT) if self.render_results.get() else 0
+
+        def render(start):
+            end = min(start + RENDER_CHUNK_SIZE, shown)
+            if start < end:
+                self.result_text.insert(tk.END, '\n'.join(passwords[start:end]) + '\n')
+            if end < shown:
+                self.render_job = self.root.after(1, render, end)
+                return
+            self.render_job = None
+            if shown < len(passwords):
+                self.result_text.insert(tk.END, f"…… 共 {len(passwords)} 个，已显示 {shown} 个，"
+                                                f"可复制或保存全部密码")
+
+        render(0)
+
+    # 把大量密码直接导出到文件，在后台线程中生成，不显示在结果区
+    def export_passwords(self):
+        options = self.read_options()
+        if options is None:
+            return
+        policy, unique, unique_history, quantity = options
+        filename = filedialog.asksaveasfilename(title="导出密码", defaultextension=".txt",
+                                                filetypes=[("文本文件", "*.txt"), ("所有文件", "*.*")])
+        if not filename:
+            return
+
+        state = {'done': 0, 'error': None, 'finished': False}
+
+        def run():
+            try:
+                generator = self.create_generator(policy, unique, unique_history)
+                with open(filename, 'w', encoding='utf-8', newline='\n') as file:
+                    write_passwords(file, generator, quantity, lambda done: state.update(done=done))
+            except (OSError, ValueError, sqlite3.Error) as e:
+                state['error'] = e
+            except Exception as e:
+                state['error'] = f"意外错误 {e!r}"
+            finally:
+                state['finished'] = True
+
+        # 后台线程只更新 state，界面由主线程定时读取
+        def poll():
+            if not state['finished']:
+                self.status_label.config(text=f"已导出 {state['done']}/{quantity}")
+                self.root.after(100, poll)
+                return
+            self.export_button.config(state=tk.NORMAL)
+            if state['error'] is not None:
+                self.status_label.config(text="")
+                messagebox.showerror("错误", f"导出失败：{state['error']}")
+            else:
+                self.status_label.config(text=f"已导出 {quantity} 个密码")
+
+        self.export_button.config(state=tk.DISABLED)
+        threading.Thread(target=run, daemon=True).start()
+        poll()
+
+    # 保存设置的函数
+    def save_settings(self):
+        settings = {}
+        settings['include_lowercase'] = self.include_lowercase.get()
+        settings['include_uppercase'] = self.include_uppercase.get()
+        settings['include_digits'] = self.include_digits.get()
+        settings['include_special_symbols'] = self.include_special_symbols.get()
+        settings['special_symbols'] = self.special_symbols_entry.get()
+        settings['excluded_chars'] = self.excluded_chars_entry.get()
+        settings['length'] = self.length_entry.get()
+        settings['quantity'] = self.quantity_entry.get()
+        settings['enable_history'] = self.enable_history.get()
+        settings['history_limit'] = self.history_limit_entry.get()
+        settings['render_results'] = self.render_results.get()
+        settings['min_per_class'] = self.min_per_class_entry.get()
+        settings['min_entropy'] = self.min_entropy_entry.get()
+        settings['no_repeat'] = self.no_repeat.get()
+        settings['no_adjacent'] = self.no_adjacent.get()
+        settings['unique'] = self.unique.get()
+        settings['unique_history'] = self.unique_history.get()
+        save_settings(self.data_dir, settings)
+
+    # 加载设置的函数
+    def load_settings(self):
+        settings = load_settings(self.data_dir)
+        if not settings:
+            return
+        self.include_lowercase.set(settings.get('include_lowercase', False))
+        self.include_uppercase.set(settings.get('include_uppercase', False))
+        self.include_digits.set(settings.get('include_digits', False))
+        self.include_special_symbols.set(settings.get('include_special_symbols', False))
+        self.special_symbols_entry.delete(0, tk.END)
+        self.special_symbols_entry.insert(0, settings.get('special_symbols', ''))
+        self.excluded_chars_entry.delete(0, tk.END)
+        self.excluded_chars_entry.insert(0, settings.get('excluded_chars', ''))
+        self.length_entry.delete(0, tk.END)
+        self.length_entry.insert(0, settings.get('length', ''))
+        self.quantity_entry.delete(0, tk.END)
+        self.quantity_entry.insert(0, settings.get('quantity', ''))
+        self.enable_history.set(settings.get('enable_history', False))
+        self.history_limit_entry.delete(0, tk.END)
+        self.history_limit_entry.insert(0, settings.get('history_limit', str(DEFAULT_HISTORY_LIMIT)))
+        self.render_results.set(settings.get('render_results', True))
+        self.min_per_class_entry.delete(0, tk.END)
+        self.min_per_class_entry.insert(0, settings.get('min_per_class', '0'))
+        self.min_entropy_entry.delete(0, tk.END)
+        self.min_entropy_entry.insert(0, settings.get('min_entropy', '0'))
+        self.no_repeat.set(settings.get('no_repeat', False))
+        self.no_adjacent.set(settings.get('no_adjacent', False))
+        self.unique.set(settings.get('unique', False))
+        self.unique_history.set(settings.get('unique_history', False))
+
+    # 复制生成的密码到剪贴板的函数，复制的是整批密码，包括结果区没有显示的部分
+    def copy_result_passwords(self):
+        if not self.passwords:
+            return
+        self.root.clipboard_clear()
+        self.root.clipboard_append('\n'.join(self.passwords))
+
+    # 把整批生成的密码保存到文件
+    def save_result_passwords(self):
+        if not self.passwords:
+            messagebox.showinfo("提示", "还没有生成密码。")
+            return
+        filename = filedialog.asksaveasfilename(title="保存密码", defaultextension=".txt",
+                                                filetypes=[("文本文件", "*.txt"), ("所有文件", "*.*")])
+        if not filename:
+            return
+        try:
+            with open(filename, 'w', encoding='utf-8', newline='\n') as file:
+                file.write('\n'.join(self.passwords) + '\n')
+        except OSError as e:
+            messagebox.showerror("错误", f"保存失败：{e}")
+            return
+        self.status_label.config(text=f"已保存 {len(self.passwords)} 个密码")
+
+    # 显示密码历史记录的函数
+    def show_history(self):
+        if self.history_window is None or not self.history_window.winfo_exists():
+            history_window = tk.Toplevel(self.root)
+            history_window.title("密码历史记录")
+            self.history_window = history_window
+
+            main_frame = tk.Frame(history_window)
+            main_frame.pack(fill=tk.BOTH, expand=True)
+
+            listbox_frame = tk.Frame(main_frame)
+            listbox_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
             listbox = Listbox(listbox_frame, height=10, width=50)
-            for line in sorted_lines:
-                parts = line.strip().split(': ')
-                if len(parts) == 2:
-                    listbox.insert(tk.END, f'{parts[0]}: {parts[1]}')
             listbox.pack(fill=tk.BOTH, expand=True)
             scrollbar = Scrollbar(listbox_frame, orient="vertical", command=listbox.yview)
-            listbox.configure(yscrollcommand=scrollbar.set)
             scrollbar.pack(side="right", fill="y")
 
-        search_frame = tk.Frame(main_frame)
-        search_frame.pack(side=tk.TOP, fill=tk.X, pady=5)
-        tk.Label(search_frame, text="输入关键词：").pack(side=tk.LEFT)
-        search_entry = tk.Entry(search_frame)
-        search_entry.pack(fill=tk.X, side=tk.LEFT, expand=True)
-        search_button = tk.Button(search_frame, text="查找", command=lambda: perform_search(search_entry.get()))
-        search_button.pack(side=tk.LEFT)
-
-        button_frame = tk.Frame(main_frame)
-        button_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
-
-        def perform_search(keyword):
-            new_results = []
-            for line in sorted_lines:
-                parts = line.strip().split(': ')
-                if len(parts) == 2:
-                    date_str = parts[0]
-                    password = parts[1]
-                    if keyword.lower() in password.lower() or (datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S') if keyword.isdigit() and '-' in keyword else None):
-                        new_results.append(line)
-            listbox.delete(0, tk.END)
-            for result in new_results:
-                parts = result.strip().split(': ')
-                if len(parts) == 2:
-                    listbox.insert(tk.END, f'{parts[0]}: {parts[1]}')
-
-        def copy_history_password(event):
-            selected_index = listbox.curselection()
-            if selected_index:
-                selected_item = listbox.get(selected_index)
-                password = selected_item.split(': ')[1]
-                root.clipboard_clear()
-                root.clipboard_append(password)
-                copy_message_label = tk.Label(listbox_frame, text=f'{password}已复制：')
-                copy_message_label.pack()
-                history_window.after(2000, copy_message_label.destroy)
-
-        listbox.bind("<Double-Button-1>", copy_history_password)
-
-        clear_history_button = tk.Button(button_frame, text="清除历史记录", command=clear_history, bg='red', fg='white')
-        clear_history_button.pack()
-
-    else:
-        history_window.lift()
-
-# 检查并清理历史记录文件的函数
-def clear_history_if_needed():
-    try:
-        with open(os.path.join(opmak_folder, 'password_history.dat'), 'r') as file:
-            lines = file.readlines()
-        if len(lines) > 1000:
-            with open(os.path.join(opmak_folder, 'password_history.dat'), 'w') as file:
-                remaining_lines = lines[-1000:]
-                for line in remaining_lines:
-                    file.write(line)
-    except FileNotFoundError:
-        pass
-
-# 清除历史记录的函数
-def clear_history():
-    try:
-        with open(os.path.join(opmak_folder, 'password_history.dat'), 'w') as file:
-            pass
+            search_frame = tk.Frame(main_frame)
+            search_frame.pack(side=tk.TOP, fill=tk.X, pady=5)
+            tk.Label(search_frame, text="输入关键词：").pack(side=tk.LEFT)
+            search_entry = tk.Entry(search_frame)
+            search_entry.pack(fill=tk.X, side=tk.LEFT, expand=True)
+            search_button = tk.Button(search_frame, text="查找", command=lambda: perform_search(search_entry.get()))
+            search_button.pack(side=tk.LEFT)
+            search_entry.bind("<Return>", lambda event: perform_search(search_entry.get()))
+
+            button_frame = tk.Frame(main_frame)
+            button_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
+
+            # 当前关键词、已加载的最后一条编号、是否已加载完
+            page_state = {'keyword': '', 'last_id': None, 'exhausted': False}
+
+            # 加载下一页追加到列表末尾
+            def load_next_page():
+                if page_state['exhausted']:
+                    return
+                rows = self.history.query(page_state['keyword'], page_state['last_id'])
+                if len(rows) < HISTORY_PAGE_SIZE:
+                    page_state['exhausted'] = True
+                if rows:
+                    page_state['last_id'] = rows[-1][0]
+                    listbox.insert(tk.END, *(f'{created}: {password}' for _, created, password in rows))
+
+            # 滚动接近底部时加载更多
+            def on_scroll(first, last):
+                scrollbar.set(first, last)
+                if float(last) >= 0.95 and not page_state['exhausted']:
+                    history_window.after_idle(load_next_page)
+
+            def perform_search(keyword):
+                page_state.update(keyword=keyword, last_id=None, exhausted=False)
+                listbox.delete(0, tk.END)
+                load_next_page()
+
+            listbox.configure(yscrollcommand=on_scroll)
+            load_next_page()
+
+            def copy_history_password(event):
+                selected_index = listbox.curselection()
+                if selected_index:
+                    selected_item = listbox.get(selected_index)
+                    password = selected_item.split(': ', 1)[1]
+                    self.root.clipboard_clear()
+                    self.root.clipboard_append(password)
+                    copy_message_label = tk.Label(listbox_frame, text=f'{password}已复制：')
+                    copy_message_label.pack()
+                    history_window.after(2000, copy_message_label.destroy)
+
+            listbox.bind("<Double-Button-1>", copy_history_password)
+
+            clear_history_button = tk.Button(button_frame, text="清除历史记录", command=self.clear_history,
+                                             bg='red', fg='white')
+            clear_history_button.pack()
+
+        else:
+            self.history_window.lift()
+
+    # 检查并清理历史记录的函数
+    def clear_history_if_needed(self):
+        # 上限调低后按编号范围删除多出的记录，不再读取整个历史
+        self.history.trim(self.history_limit())
+
+    # 清除历史记录的函数
+    def clear_history(self):
+        self.history.clear()
         messagebox.showinfo("提示", "历史记录已清除。")
-        history_window.destroy()
-        show_history()
-    except FileNotFoundError:
-        messagebox.showinfo("提示", "暂无历史记录可清除。")
+        self.history_window.destroy()
+        self.show_history()
 
-root = tk.Tk()
-root.title("随机密码生成器 - by 章鱼")
 
-root.resizable(False, False)
-root.geometry("500x430")
+def main():
+    parser = argparse.ArgumentParser(description="随机密码生成器")
+    parser.add_argument("--data-dir", default=default_data_dir(), help="数据目录，默认 $OPMAK_DIR 或 ~/OPMAK")
+    args = parser.parse_args()
 
-left_frame = tk.Frame(root)
-left_frame.pack(side="left", padx=10)
+    root = tk.Tk()
+    app = PasswordGeneratorApp(root, args.data_dir)
+    root.mainloop()
+    app.history.close()
 
-right_frame = tk.Frame(root)
-right_frame.pack(side="right", padx=10)
 
-tk.Label(left_frame, text="所用字符").pack()
-include_lowercase = tk.BooleanVar()
-tk.Checkbutton(left_frame, text="小写字母(a-z)", variable=include_lowercase).pack()
-include_uppercase = tk.BooleanVar()
-tk.Checkbutton(left_frame, text="大写字母(A-Z)", variable=include_uppercase).pack()
-include_digits = tk.BooleanVar()
-tk.Checkbutton(left_frame, text="数字(0-9)", variable=include_digits).pack()
-include_special_symbols = tk.BooleanVar()
-tk.Label(left_frame, text="特殊符号：").pack()
-special_symbols_entry = tk.Entry(left_frame)
-special_symbols_entry.pack()
-tk.Checkbutton(left_frame, text="自定义特殊符号", variable=include_special_symbols).pack()
-
-tk.Label(left_frame, text="排除字符：").pack()
-excluded_chars_entry = tk.Entry(left_frame)
-excluded_chars_entry.pack()
-
-tk.Label(left_frame, text="密码长度：").pack()
-length_entry = tk.Entry(left_frame)
-length_entry.pack()
-tk.Label(left_frame, text="密码数量：").pack()
-quantity_entry = tk.Entry(left_frame)
-quantity_entry.pack()
-
-enable_history = tk.BooleanVar()
-tk.Checkbutton(left_frame, text="记录历史记录", variable=enable_history).pack()
-
-tk.Button(left_frame, text="生成密码", command=generate_password).pack()
-tk.Button(left_frame, text="保存设置", command=save_settings).pack()
-
-result_text = tk.Text(right_frame, height=10, width=50)
-result_text.pack()
-tk.Button(right_frame, text="查看历史记录", command=show_history).pack()
-
-copy_result_button = tk.Button(right_frame, text="复制生成的密码", command=copy_result_passwords)
-copy_result_button.pack()
-
-load_settings()
-
-history_window = None
-
-root.after(0, clear_history_if_needed)
-
-root.mainloop()
+if __name__ == '__main__':
+    main()